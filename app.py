@@ -8,26 +8,62 @@
 4. 報表統計
 """
 
+import os
+import gzip
+import time
+import hashlib
+import functools
+import string
+import shutil
+import tempfile
+import uuid
+import logging
+import threading
+from collections import OrderedDict, defaultdict
 from datetime import date, datetime
 from typing import Optional, List
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Depends, HTTPException, Query, Form, UploadFile, File
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, Query, Form, UploadFile, File, Request, BackgroundTasks
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
-from sqlalchemy.exc import SQLAlchemyError
-import pandas as pd
-import io
+from sqlalchemy.orm import Session, selectinload, joinedload
+from sqlalchemy import func, and_, or_, exists, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+import anyio.to_thread
+import orjson
+
+# brotli 為選用相依，有安裝時對支援 br 的瀏覽器改送 brotli 壓縮的頁面
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# rcssmin / rjsmin 為選用相依，有安裝時首頁 CSS / JS 於啟動時壓縮一次
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
 
 from models import (
-    init_db, get_db, SessionLocal, init_default_settings,
+    init_db, get_db, SessionLocal, init_default_settings, DB_POOL_SIZE, DB_MAX_OVERFLOW,
     Project, Mix, Truck, ProjectPrice, Dispatch, Setting, MaterialPrice,
-    DailySummary, DriverAttendance
+    DailySummary, DriverAttendance, daily_project_stats, refresh_daily_project_stats,
+    uses_stats_view, engine
 )
-from calculator import DispatchCalculator
+from calculator import (
+    DispatchCalculator, project_lookup_cache, truck_lookup_cache, mix_lookup_cache,
+    settings_cache
+)
+
+logger = logging.getLogger(__name__)
 
 
 # ============================================================
@@ -87,6 +123,14 @@ class ProjectResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProjectListItem(BaseModel):
+    """首頁用的精簡欄位"""
+    id: int
+    code: str
+    name: str
+    default_distance_km: float
+    is_active: bool
+
 # --- 車輛 ---
 class TruckCreate(BaseModel):
     code: str
@@ -111,6 +155,14 @@ class TruckResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class TruckListItem(BaseModel):
+    """首頁用的精簡欄位"""
+    id: int
+    code: str
+    plate_no: str
+    driver_name: Optional[str]
+    is_active: bool
+
 # --- 配比 ---
 class MixCreate(BaseModel):
     code: str
@@ -149,6 +201,13 @@ class MixResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MixListItem(BaseModel):
+    """首頁用的精簡欄位"""
+    id: int
+    code: str
+    psi: int
+    is_active: bool
+
 # --- 單價 ---
 class PriceCreate(BaseModel):
     project_id: int
@@ -251,81 +310,515 @@ class DailySummaryResponse(BaseModel):
 # FastAPI App
 # ============================================================
 
+class ORJSONResponse(JSONResponse):
+    """以 orjson 序列化的 JSON 回應（原生支援 date/datetime，且比標準 json 快）"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+
+def schema_columns(model, schema) -> list:
+    """
+    schema 各欄位對應的資料表欄位
+
+    以欄位查詢只建立輕量的 Row，不必為每列建立 ORM 物件與 identity map 紀錄；
+    列表 API 僅供輸出，不需要可追蹤變更的物件。
+    """
+    return [getattr(model, f) for f in schema.model_fields]
+
+
+def orm_rows(rows, schema) -> list:
+    """依 schema 欄位把 ORM 物件（或欄位查詢的 Row）轉為 dict 列表"""
+    fields = list(schema.model_fields)
+    return [{f: getattr(r, f) for f in fields} for r in rows]
+
+
+def orm_list_response(
+    rows,
+    schema,
+    request: Optional[Request] = None,
+    cache_key=None,
+) -> Response:
+    """
+    直接以 orjson 輸出 ORM 列表
+
+    回傳 Response 物件時 FastAPI 不會再以 response_model 逐筆驗證，
+    response_model 仍保留供 API 文件使用。
+    有傳入 request 時附上 ETag，內容未變則回 304。
+    有傳入 cache_key 時序列化結果存在 report_cache（寫入路由完成後清空）；
+    rows 可傳尚未執行的 Query，命中快取時就不會查詢資料庫。
+    """
+    if cache_key is None:
+        response = ORJSONResponse(orm_rows(rows, schema))
+    else:
+        body = cached_json_bytes(cache_key, lambda: orm_rows(rows, schema))
+        response = Response(body, media_type="application/json")
+    if request is None:
+        return response
+    return with_etag(response, request)
+
+
+@functools.lru_cache(maxsize=64)
+def _body_etag(body: bytes) -> str:
+    """
+    回應內容的 ETag
+
+    快取中的回應每次都是同一個 bytes 物件，查表以物件身分比對即可命中，
+    不必每個請求重新計算 md5。
+    """
+    return f'"{hashlib.md5(body).hexdigest()}"'
+
+
+def with_etag(response: Response, request: Request) -> Response:
+    """
+    依回應內容附上 ETag；與 If-None-Match 相符時改回 304
+
+    Cache-Control: no-cache 讓瀏覽器每次都以 If-None-Match 重新驗證，
+    前端不必在 fetch 指定 cache 模式（preload 的請求才能直接沿用）。
+    """
+    etag = _body_etag(response.body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # If-None-Match 可能帶多個值或 W/ 前綴（經過會改寫內容的代理時）
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
+
+
+def stream_json_array(query, to_dict) -> StreamingResponse:
+    """
+    逐列輸出 JSON 陣列
+
+    query 可為 yield_per 的查詢，資料庫游標一次只取一批，
+    不必先把整個結果集與序列化後的列表放進記憶體。
+    回應送出時請求的 Session 可能已被 get_db 關閉（依 FastAPI 版本而定），
+    因此改用獨立的 Session 執行查詢，送完再關閉。
+    """
+    def gen():
+        db = SessionLocal()
+        try:
+            yield b"["
+            first = True
+            for row in query.with_session(db):
+                if not first:
+                    yield b","
+                first = False
+                yield orjson.dumps(to_dict(row), option=orjson.OPT_NON_STR_KEYS)
+            yield b"]"
+        except Exception:
+            # 狀態碼已送出，只能中斷連線；記錄下來以免被當成正常的截斷結果
+            logger.exception("串流 JSON 回應途中發生錯誤")
+            raise
+        finally:
+            db.close()
+
+    return StreamingResponse(gen(), media_type="application/json")
+
+
+class ReportCache:
+    """
+    報表回應快取（key → 已序列化的 JSON bytes；主檔列表亦共用）
+
+    寫入路由（WRITE_ROUTE）完成後清空快取並遞增 generation；計算中遇到清空的結果
+    不會寫回，避免把寫入前的舊資料存進快取。
+    快取存在各 process 內，多 worker 時其他 worker 最多延遲一個 TTL 才更新。
+    """
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.generation = 0
+        # 依最近使用排序，滿了先淘汰最久未用的項目
+        self._data = OrderedDict()
+
+    def get(self, key) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        body, expires_at = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            # 另一個 thread 剛好清空或淘汰
+            pass
+        return body
+
+    def set(self, key, body: bytes, ttl: float, generation: int):
+        if generation != self.generation:
+            return
+        # 先移除舊值，重新寫入的項目排到最後
+        if self._data.pop(key, None) is None and len(self._data) >= self.maxsize:
+            self._evict()
+        self._data[key] = (body, time.monotonic() + ttl)
+
+    def _evict(self):
+        """先移除已過期的項目；仍然滿了才淘汰最久未用的一筆，不整個清空"""
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in list(self._data.items()) if expires_at < now]:
+            self._data.pop(key, None)
+        while len(self._data) >= self.maxsize:
+            try:
+                self._data.popitem(last=False)
+            except KeyError:
+                break
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+
+
+# 快取存在各 process 內，寫入只會清空處理該請求的 worker；其他 worker 最多延遲一個 TTL。
+# 舊日期的出車仍可能被修改，預設與當期相同的短 TTL；單一 worker 部署可調長 REPORT_CACHE_TTL_PAST
+REPORT_CACHE_TTL_CURRENT = float(os.environ.get("REPORT_CACHE_TTL_CURRENT", "60"))
+REPORT_CACHE_TTL_PAST = float(os.environ.get("REPORT_CACHE_TTL_PAST", str(REPORT_CACHE_TTL_CURRENT)))
+report_cache = ReportCache()
+
+
+async def clear_report_cache_after_write():
+    """寫入路由的相依：handler 結束（已 commit）後清空報表快取"""
+    try:
+        yield
+    finally:
+        report_cache.clear()
+
+
+# 會寫入資料的路由加上 dependencies=WRITE_ROUTE；預覽等唯讀 POST 不清快取
+WRITE_ROUTE = [Depends(clear_report_cache_after_write)]
+
+
+# 報表 materialized view 的更新在回應送出後於背景執行；同時只跑一次，
+# 執行中又有寫入時只標記待更新，跑完再補一次（多筆寫入合併成一次 REFRESH）
+_stats_refresh_lock = threading.Lock()
+_stats_refresh_pending = False
+
+
+def _refresh_stats_job():
+    global _stats_refresh_pending
+    _stats_refresh_pending = True
+    while _stats_refresh_pending:
+        if not _stats_refresh_lock.acquire(blocking=False):
+            return
+        try:
+            _stats_refresh_pending = False
+            db = SessionLocal()
+            try:
+                refresh_daily_project_stats(db)
+            except Exception:
+                # 出車資料已寫入，更新失敗只記錄，下一次寫入會再更新
+                logger.exception("更新報表 materialized view 失敗")
+            else:
+                report_cache.clear()
+            finally:
+                db.close()
+        finally:
+            _stats_refresh_lock.release()
+
+
+def schedule_stats_refresh(background_tasks: BackgroundTasks):
+    """出車異動後排入背景更新報表 view（僅 PostgreSQL）；寫入回應不受更新結果影響"""
+    if uses_stats_view(engine):
+        background_tasks.add_task(_refresh_stats_job)
+
+
+def cached_json_bytes(key, build) -> bytes:
+    """以 report_cache 快取 build() 結果序列化後的 JSON bytes"""
+    body = report_cache.get(key)
+    if body is None:
+        generation = report_cache.generation
+        body = orjson.dumps(build(), option=orjson.OPT_NON_STR_KEYS)
+        report_cache.set(key, body, REPORT_CACHE_TTL_CURRENT, generation)
+    return body
+
+
+# 同步 handler 在 anyio threadpool 中執行（預設只有 40 個 thread）；
+# 預設放寬到與連線池上限相同，讓每個可取得的 DB 連線都有 thread 可用
+THREADPOOL_SIZE = int(os.environ.get("THREADPOOL_SIZE", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """啟動時初始化"""
-    init_db()
-    db = SessionLocal()
-    init_default_settings(db)
-    db.close()
+    """
+    啟動時初始化
+
+    多 worker 部署時請設 RUN_DB_INIT=0，並在啟動前先執行一次
+    `python models.py` 建表與預設設定，避免各 worker 同時跑 DDL。
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    if os.environ.get("RUN_DB_INIT", "1") == "1":
+        init_db()
+        db = SessionLocal()
+        init_default_settings(db)
+        db.close()
+    if app.openapi_url:
+        # 預先產生 OpenAPI schema，避免第一次開 /docs 時才建構
+        app.openapi()
     yield
 
+# 正式環境可設 ENABLE_DOCS=0 關閉 API 文件，省去 schema 建構
+ENABLE_DOCS = os.environ.get("ENABLE_DOCS", "1") == "1"
+
 app = FastAPI(
     title="預拌混凝土出車管理系統 v2",
     description="簡化的出車管理、成本計算、損益分析",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+    openapi_url="/openapi.json" if ENABLE_DOCS else None,
+    docs_url="/docs" if ENABLE_DOCS else None,
+    redoc_url="/redoc" if ENABLE_DOCS else None,
 )
 
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# CORS：前面有反向代理代為加上標頭時可設 ENABLE_CORS=0，省去每個請求的 middleware
+ENABLE_CORS = os.environ.get("ENABLE_CORS", "1") == "1"
+if ENABLE_CORS:
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
 
 
 # ============================================================
 # 首頁
 # ============================================================
 
+# 首頁與管理頁的 CSS / JS 放在 static/，啟動時讀入一次；網址帶內容雜湊，可讓瀏覽器長期快取
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+STATIC_MEDIA_TYPES = {
+    "app.css": "text/css; charset=utf-8",
+    "app.js": "application/javascript; charset=utf-8",
+    "admin.css": "text/css; charset=utf-8",
+    "admin.js": "application/javascript; charset=utf-8",
+}
+STATIC_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+STATIC_MINIFIERS = {
+    ".css": rcssmin.cssmin if rcssmin else None,
+    ".js": rjsmin.jsmin if rjsmin else None,
+}
+
+
+def _load_static_assets() -> dict:
+    assets = {}
+    for name in STATIC_MEDIA_TYPES:
+        with open(os.path.join(STATIC_DIR, name), "rb") as f:
+            content = f.read()
+        minify = STATIC_MINIFIERS[os.path.splitext(name)[1]]
+        if minify:
+            content = minify(content.decode("utf-8")).encode("utf-8")
+        assets[name] = content
+    return assets
+
+
+_STATIC_ASSETS = _load_static_assets()
+
+
+@functools.lru_cache(maxsize=2)
+def _main_page_bytes(day: str) -> bytes:
+    """首頁 HTML 只隨日期（日期欄位預設值）變動，每天只產生並編碼一次"""
+    return get_main_page_html(day).encode("utf-8")
+
+
+# admin.html 於啟動時以 bytes 讀入一次（修改檔案後需重啟服務）；讀不到時用內嵌備用頁面
+# CSS / JS 在 static/admin.css、static/admin.js，頁面以 $admin_css_version / $admin_js_version 帶入內容雜湊
+ADMIN_HTML_PATH = os.path.join(os.path.dirname(__file__), "admin.html")
+try:
+    with open(ADMIN_HTML_PATH, "rb") as f:
+        _ADMIN_HTML: Optional[bytes] = f.read()
+except OSError:
+    _ADMIN_HTML = None
+
+
+@functools.lru_cache(maxsize=None)
+def _admin_page_bytes() -> bytes:
+    """管理頁只產生並編碼一次（admin.html 或備用頁面）"""
+    return get_admin_page_html().encode("utf-8")
+
+
+def _page_raw(page: str, day: str = "") -> bytes:
+    """頁面或靜態檔的原始內容（首頁依 day 填入日期）"""
+    if page == "main":
+        return _main_page_bytes(day)
+    if page == "admin":
+        return _admin_page_bytes()
+    return _STATIC_ASSETS[page]
+
+
+@functools.lru_cache(maxsize=16)
+def _gzipped(page: str, day: str = "") -> bytes:
+    """預先壓縮的頁面內容（每個頁面每天只壓縮一次）"""
+    return gzip.compress(_page_raw(page, day), compresslevel=9)
+
+
+@functools.lru_cache(maxsize=16)
+def _brotli(page: str, day: str = "") -> bytes:
+    """預先以 brotli 壓縮的頁面內容（需安裝 brotli）"""
+    return brotli.compress(_page_raw(page, day), quality=11)
+
+
+# 內容編碼 -> (ETag 後綴, 預先壓縮函式)；依序為優先順序
+PRECOMPRESSED_ENCODINGS = [("gzip", "-gz", _gzipped)]
+if brotli is not None:
+    PRECOMPRESSED_ENCODINGS.insert(0, ("br", "-br", _brotli))
+
+
+@functools.lru_cache(maxsize=16)
+def _page_etag(page: str, day: str = "") -> str:
+    """頁面內容的雜湊"""
+    return hashlib.blake2b(_page_raw(page, day), digest_size=8).hexdigest()
+
+
+# 頁面瀏覽器快取秒數；到期後以 ETag 重新驗證
+HTML_MAX_AGE = int(os.environ.get("HTML_MAX_AGE", "300"))
+
+
+def html_page_response(
+    request: Request,
+    page: str,
+    media_type: str = "text/html; charset=utf-8",
+    cache_control: str = f"public, max-age={HTML_MAX_AGE}",
+) -> Response:
+    """
+    回傳 HTML 頁面（或 static/ 內的靜態檔）
+
+    - If-None-Match 符合時回 304
+    - 用戶端支援 br / gzip 時回傳預先壓縮的內容（ETag 加上 -br / -gz 以區分編碼）
+    """
+    # 首頁的日期欄位預設為今天，內容每天不同；其他頁面與靜態檔固定
+    day = date.today().isoformat() if page == "main" else ""
+    etag = _page_etag(page, day)
+    accept_encoding = request.headers.get("accept-encoding", "")
+    encoding = next((e for e in PRECOMPRESSED_ENCODINGS if e[0] in accept_encoding), None)
+    headers = {
+        "ETag": f'"{etag}{encoding[1]}"' if encoding else f'"{etag}"',
+        "Cache-Control": cache_control,
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match and etag in if_none_match:
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding[0]
+        return Response(content=encoding[2](page, day), media_type=media_type, headers=headers)
+    return Response(content=_page_raw(page, day), media_type=media_type, headers=headers)
+
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
-    return get_main_page_html()
+async def root(request: Request):
+    return html_page_response(request, "main")
 
 @app.get("/admin", response_class=HTMLResponse)
-async def admin_page():
+async def admin_page(request: Request):
     """基礎資料管理介面"""
-    return get_admin_page_html()
+    return html_page_response(request, "admin")
+
+@app.get("/static/{name}", include_in_schema=False)
+async def static_asset(name: str, request: Request):
+    """首頁與管理頁的 CSS / JS（網址帶 ?v=內容雜湊，內容變動即換網址）"""
+    if name not in _STATIC_ASSETS:
+        raise HTTPException(404, "檔案不存在")
+    return html_page_response(request, name, STATIC_MEDIA_TYPES[name], STATIC_CACHE_CONTROL)
 
 
 def get_project_by_code_or_name(db: Session, query: str) -> Project:
     """用代碼或名稱尋找工程（精確匹配）。"""
+    cached_id = project_lookup_cache.get(("exact", query))
+    if cached_id is not None:
+        project = db.get(Project, cached_id)
+        if project:
+            return project
+
     project = db.query(Project).filter(
         (Project.code == query) | (Project.name == query)
     ).first()
     if not project:
         raise HTTPException(404, f"找不到工程：{query}")
+    project_lookup_cache.set(("exact", query), project.id)
     return project
 
 
+def begin_read_only(db: Session) -> None:
+    """
+    在 Session 的第一個查詢前把交易標為唯讀（僅 PostgreSQL）
+
+    預覽類請求的所有查詢都在同一個唯讀交易內執行；Session 已設 autoflush=False，
+    查詢前不會有 flush 檢查。連線歸還連線池時會恢復原本的設定。
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"postgresql_readonly": True})
+
+
+# 支援 INSERT ... ON CONFLICT DO NOTHING 的資料庫
+ON_CONFLICT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def insert_if_absent(db: Session, model, values: dict, index_elements: List[str]):
+    """
+    新增資料；已存在時回傳 None，否則回傳新增的物件
+
+    PostgreSQL / SQLite 以單一 INSERT ... ON CONFLICT DO NOTHING 完成（無先查後寫的競態）；
+    其他資料庫先查再寫，同時寫入造成的唯一鍵衝突同樣視為已存在。
+    """
+    insert_fn = ON_CONFLICT_INSERTS.get(db.get_bind().dialect.name)
+    if insert_fn is not None:
+        stmt = (
+            insert_fn(model)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=index_elements)
+            .returning(model)
+        )
+        obj = db.scalars(stmt).first()
+        db.commit()
+        return obj
+
+    lookup = exists().where(*[getattr(model, name) == values[name] for name in index_elements])
+    if db.query(lookup).scalar():
+        return None
+    obj = model(**values)
+    db.add(obj)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if db.query(lookup).scalar():
+            return None
+        raise
+    db.refresh(obj)
+    return obj
+
+
 # ============================================================
 # 工程 API
 # ============================================================
 
 @app.get("/api/projects", response_model=List[ProjectResponse])
 def list_projects(
+    request: Request,
     active_only: bool = True,
     db: Session = Depends(get_db)
 ):
     """列出所有工程"""
-    query = db.query(Project)
+    query = db.query(*schema_columns(Project, ProjectResponse))
     if active_only:
         query = query.filter(Project.is_active == True)
-    return query.order_by(Project.code).all()
+    return orm_list_response(query.order_by(Project.code), ProjectResponse, request, ("projects", active_only))
 
-@app.post("/api/projects", response_model=ProjectResponse)
+@app.post("/api/projects", response_model=ProjectResponse, dependencies=WRITE_ROUTE)
 def create_project(data: ProjectCreate, db: Session = Depends(get_db)):
     """新增工程"""
-    existing = db.query(Project).filter(Project.code == data.code).first()
-    if existing:
+    project = insert_if_absent(db, Project, data.model_dump(), ["code"])
+    if project is None:
         raise HTTPException(400, f"工程代碼已存在：{data.code}")
-    
-    project = Project(**data.model_dump())
-    db.add(project)
-    db.commit()
-    db.refresh(project)
+    project_lookup_cache.clear()
     return project
 
 @app.get("/api/projects/{project_id}")
@@ -336,7 +829,7 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(404, "工程不存在")
     return project
 
-@app.put("/api/projects/{project_id}")
+@app.put("/api/projects/{project_id}", dependencies=WRITE_ROUTE)
 def update_project(project_id: int, data: ProjectCreate, db: Session = Depends(get_db)):
     """更新工程"""
     project = db.query(Project).filter(Project.id == project_id).first()
@@ -347,32 +840,36 @@ def update_project(project_id: int, data: ProjectCreate, db: Session = Depends(g
         setattr(project, key, value)
 
     db.commit()
+    project_lookup_cache.clear()
     return {"status": "ok"}
 
 
-@app.delete("/api/projects/{project_id}")
+@app.delete("/api/projects/{project_id}", dependencies=WRITE_ROUTE)
 def delete_project(project_id: int, db: Session = Depends(get_db)):
     """刪除工程"""
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(404, "工程不存在")
 
-    has_dispatch = db.query(Dispatch).filter(Dispatch.project_id == project_id).first()
-    has_price = db.query(ProjectPrice).filter(ProjectPrice.project_id == project_id).first()
+    has_dispatch = db.query(exists().where(Dispatch.project_id == project_id)).scalar()
+    has_price = db.query(exists().where(ProjectPrice.project_id == project_id)).scalar()
 
     if has_dispatch or has_price:
         project.is_active = False
         db.commit()
+        project_lookup_cache.clear()
         return {"status": "disabled", "message": "已有出車或單價紀錄，改為停用"}
 
     try:
         db.delete(project)
         db.commit()
+        project_lookup_cache.clear()
         return {"status": "deleted", "message": "已刪除工程"}
     except SQLAlchemyError:
         db.rollback()
         project.is_active = False
         db.commit()
+        project_lookup_cache.clear()
         return {"status": "disabled", "message": "刪除失敗，已改為停用"}
 
 
@@ -381,24 +878,20 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
 # ============================================================
 
 @app.get("/api/trucks", response_model=List[TruckResponse])
-def list_trucks(active_only: bool = True, db: Session = Depends(get_db)):
+def list_trucks(request: Request, active_only: bool = True, db: Session = Depends(get_db)):
     """列出所有車輛"""
-    query = db.query(Truck)
+    query = db.query(*schema_columns(Truck, TruckResponse))
     if active_only:
         query = query.filter(Truck.is_active == True)
-    return query.order_by(Truck.code).all()
+    return orm_list_response(query.order_by(Truck.code), TruckResponse, request, ("trucks", active_only))
 
-@app.post("/api/trucks", response_model=TruckResponse)
+@app.post("/api/trucks", response_model=TruckResponse, dependencies=WRITE_ROUTE)
 def create_truck(data: TruckCreate, db: Session = Depends(get_db)):
     """新增車輛"""
-    existing = db.query(Truck).filter(Truck.code == data.code).first()
-    if existing:
+    truck = insert_if_absent(db, Truck, data.model_dump(), ["code"])
+    if truck is None:
         raise HTTPException(400, f"車輛代碼已存在：{data.code}")
-    
-    truck = Truck(**data.model_dump())
-    db.add(truck)
-    db.commit()
-    db.refresh(truck)
+    truck_lookup_cache.clear()
     return truck
 
 @app.get("/api/trucks/{truck_id}")
@@ -419,7 +912,7 @@ def get_truck(truck_id: int, db: Session = Depends(get_db)):
         "is_active": truck.is_active
     }
 
-@app.put("/api/trucks/{truck_id}")
+@app.put("/api/trucks/{truck_id}", dependencies=WRITE_ROUTE)
 def update_truck(truck_id: int, data: TruckCreate, db: Session = Depends(get_db)):
     """更新車輛"""
     truck = db.query(Truck).filter(Truck.id == truck_id).first()
@@ -431,31 +924,35 @@ def update_truck(truck_id: int, data: TruckCreate, db: Session = Depends(get_db)
             setattr(truck, key, value)
 
     db.commit()
+    truck_lookup_cache.clear()
     return {"status": "ok"}
 
 
-@app.delete("/api/trucks/{truck_id}")
+@app.delete("/api/trucks/{truck_id}", dependencies=WRITE_ROUTE)
 def delete_truck(truck_id: int, db: Session = Depends(get_db)):
     """刪除車輛"""
     truck = db.query(Truck).filter(Truck.id == truck_id).first()
     if not truck:
         raise HTTPException(404, "車輛不存在")
 
-    has_dispatch = db.query(Dispatch).filter(Dispatch.truck_id == truck_id).first()
+    has_dispatch = db.query(exists().where(Dispatch.truck_id == truck_id)).scalar()
 
     if has_dispatch:
         truck.is_active = False
         db.commit()
+        truck_lookup_cache.clear()
         return {"status": "disabled", "message": "已有出車紀錄，改為停用"}
 
     try:
         db.delete(truck)
         db.commit()
+        truck_lookup_cache.clear()
         return {"status": "deleted", "message": "已刪除車輛"}
     except SQLAlchemyError:
         db.rollback()
         truck.is_active = False
         db.commit()
+        truck_lookup_cache.clear()
         return {"status": "disabled", "message": "刪除失敗，已改為停用"}
 
 
@@ -464,24 +961,22 @@ def delete_truck(truck_id: int, db: Session = Depends(get_db)):
 # ============================================================
 
 @app.get("/api/material-prices", response_model=List[MaterialPriceResponse])
-def list_material_prices(active_only: bool = True, db: Session = Depends(get_db)):
+def list_material_prices(request: Request, active_only: bool = True, db: Session = Depends(get_db)):
     """列出所有材料單價"""
-    query = db.query(MaterialPrice)
+    query = db.query(*schema_columns(MaterialPrice, MaterialPriceResponse))
     if active_only:
         query = query.filter(MaterialPrice.is_active == True)
-    return query.order_by(MaterialPrice.price_id.desc()).all()
+    return orm_list_response(
+        query.order_by(MaterialPrice.price_id.desc()), MaterialPriceResponse, request,
+        ("material_prices", active_only),
+    )
 
-@app.post("/api/material-prices", response_model=MaterialPriceResponse)
+@app.post("/api/material-prices", response_model=MaterialPriceResponse, dependencies=WRITE_ROUTE)
 def create_material_price(data: MaterialPriceCreate, db: Session = Depends(get_db)):
     """新增材料單價"""
-    existing = db.query(MaterialPrice).filter(MaterialPrice.price_id == data.price_id).first()
-    if existing:
+    mp = insert_if_absent(db, MaterialPrice, data.model_dump(), ["price_id"])
+    if mp is None:
         raise HTTPException(400, f"價格代碼已存在：{data.price_id}")
-    
-    mp = MaterialPrice(**data.model_dump())
-    db.add(mp)
-    db.commit()
-    db.refresh(mp)
     return mp
 
 @app.get("/api/material-prices/{mp_id}")
@@ -503,7 +998,7 @@ def get_material_price(mp_id: int, db: Session = Depends(get_db)):
         "is_active": mp.is_active
     }
 
-@app.put("/api/material-prices/{mp_id}")
+@app.put("/api/material-prices/{mp_id}", dependencies=WRITE_ROUTE)
 def update_material_price(mp_id: int, data: MaterialPriceCreate, db: Session = Depends(get_db)):
     """更新材料單價"""
     mp = db.query(MaterialPrice).filter(MaterialPrice.id == mp_id).first()
@@ -518,14 +1013,14 @@ def update_material_price(mp_id: int, data: MaterialPriceCreate, db: Session = D
     return {"status": "ok"}
 
 
-@app.delete("/api/material-prices/{mp_id}")
+@app.delete("/api/material-prices/{mp_id}", dependencies=WRITE_ROUTE)
 def delete_material_price(mp_id: int, db: Session = Depends(get_db)):
     """刪除材料單價"""
     mp = db.query(MaterialPrice).filter(MaterialPrice.id == mp_id).first()
     if not mp:
         raise HTTPException(404, "材料單價不存在")
 
-    has_mix = db.query(Mix).filter(Mix.material_price_id == mp_id).first()
+    has_mix = db.query(exists().where(Mix.material_price_id == mp_id)).scalar()
 
     if has_mix:
         mp.is_active = False
@@ -542,19 +1037,18 @@ def delete_material_price(mp_id: int, db: Session = Depends(get_db)):
         db.commit()
         return {"status": "disabled", "message": "刪除失敗，已改為停用"}
 
-@app.post("/api/material-prices/{mp_id}/recalc-mixes")
+@app.post("/api/material-prices/{mp_id}/recalc-mixes", dependencies=WRITE_ROUTE)
 def recalc_mixes_cost(mp_id: int, db: Session = Depends(get_db)):
     """重新計算使用此材料單價的所有配比成本"""
     mp = db.query(MaterialPrice).filter(MaterialPrice.id == mp_id).first()
     if not mp:
         raise HTTPException(404, "材料單價不存在")
     
-    mixes = db.query(Mix).filter(Mix.material_price_id == mp_id).all()
-    updated = 0
-    for mix in mixes:
-        mix.material_cost_per_m3 = mix.calc_material_cost(mp)
-        updated += 1
-    
+    # 單一 UPDATE 在資料庫端重算，不必逐筆載入配比
+    updated = db.query(Mix).filter(Mix.material_price_id == mp_id).update(
+        {Mix.material_cost_per_m3: Mix.material_cost_expr(mp)},
+        synchronize_session=False,
+    )
     db.commit()
     return {"status": "ok", "updated": updated}
 
@@ -564,17 +1058,17 @@ def recalc_mixes_cost(mp_id: int, db: Session = Depends(get_db)):
 # ============================================================
 
 @app.get("/api/mixes", response_model=List[MixResponse])
-def list_mixes(active_only: bool = True, db: Session = Depends(get_db)):
+def list_mixes(request: Request, active_only: bool = True, db: Session = Depends(get_db)):
     """列出所有配比"""
-    query = db.query(Mix)
+    query = db.query(*schema_columns(Mix, MixResponse))
     if active_only:
         query = query.filter(Mix.is_active == True)
-    return query.order_by(Mix.psi).all()
+    return orm_list_response(query.order_by(Mix.psi), MixResponse, request, ("mixes", active_only))
 
 @app.get("/api/mixes/{mix_id}")
 def get_mix(mix_id: int, db: Session = Depends(get_db)):
     """取得單一配比詳情"""
-    mix = db.query(Mix).filter(Mix.id == mix_id).first()
+    mix = db.query(Mix).options(joinedload(Mix.material_price)).filter(Mix.id == mix_id).first()
     if not mix:
         raise HTTPException(404, "配比不存在")
     
@@ -603,27 +1097,24 @@ def get_mix(mix_id: int, db: Session = Depends(get_db)):
     
     return result
 
-@app.post("/api/mixes", response_model=MixResponse)
+@app.post("/api/mixes", response_model=MixResponse, dependencies=WRITE_ROUTE)
 def create_mix(data: MixCreate, db: Session = Depends(get_db)):
     """新增配比"""
-    existing = db.query(Mix).filter(Mix.code == data.code).first()
-    if existing:
-        raise HTTPException(400, f"配比代碼已存在：{data.code}")
-    
-    mix = Mix(**data.model_dump())
+    values = data.model_dump()
     
     # 自動計算材料成本
-    if mix.material_price_id:
-        mp = db.query(MaterialPrice).filter(MaterialPrice.id == mix.material_price_id).first()
+    if data.material_price_id:
+        mp = db.query(MaterialPrice).filter(MaterialPrice.id == data.material_price_id).first()
         if mp:
-            mix.material_cost_per_m3 = mix.calc_material_cost(mp)
+            values["material_cost_per_m3"] = Mix(**data.model_dump()).calc_material_cost(mp)
     
-    db.add(mix)
-    db.commit()
-    db.refresh(mix)
+    mix = insert_if_absent(db, Mix, values, ["code"])
+    if mix is None:
+        raise HTTPException(400, f"配比代碼已存在：{data.code}")
+    mix_lookup_cache.clear()
     return mix
 
-@app.put("/api/mixes/{mix_id}")
+@app.put("/api/mixes/{mix_id}", dependencies=WRITE_ROUTE)
 def update_mix(mix_id: int, data: MixCreate, db: Session = Depends(get_db)):
     """更新配比"""
     mix = db.query(Mix).filter(Mix.id == mix_id).first()
@@ -641,36 +1132,65 @@ def update_mix(mix_id: int, data: MixCreate, db: Session = Depends(get_db)):
             mix.material_cost_per_m3 = mix.calc_material_cost(mp)
 
     db.commit()
+    mix_lookup_cache.clear()
     return {"status": "ok", "material_cost_per_m3": mix.material_cost_per_m3}
 
 
-@app.delete("/api/mixes/{mix_id}")
+@app.delete("/api/mixes/{mix_id}", dependencies=WRITE_ROUTE)
 def delete_mix(mix_id: int, db: Session = Depends(get_db)):
     """刪除配比"""
     mix = db.query(Mix).filter(Mix.id == mix_id).first()
     if not mix:
         raise HTTPException(404, "配比不存在")
 
-    has_dispatch = db.query(Dispatch).filter(Dispatch.mix_id == mix_id).first()
-    has_price = db.query(ProjectPrice).filter(ProjectPrice.mix_id == mix_id).first()
-    referenced_by_project = db.query(Project).filter(Project.default_mix_id == mix_id).first()
+    has_dispatch = db.query(exists().where(Dispatch.mix_id == mix_id)).scalar()
+    has_price = db.query(exists().where(ProjectPrice.mix_id == mix_id)).scalar()
+    referenced_by_project = db.query(exists().where(Project.default_mix_id == mix_id)).scalar()
 
     if has_dispatch or has_price or referenced_by_project:
         mix.is_active = False
         db.commit()
+        mix_lookup_cache.clear()
         return {"status": "disabled", "message": "已有出車、單價或工程引用，改為停用"}
 
     try:
         db.delete(mix)
         db.commit()
+        mix_lookup_cache.clear()
         return {"status": "deleted", "message": "已刪除配比"}
     except SQLAlchemyError:
         db.rollback()
         mix.is_active = False
         db.commit()
+        mix_lookup_cache.clear()
         return {"status": "disabled", "message": "刪除失敗，已改為停用"}
 
 
+# ============================================================
+# 首頁初始資料 API
+# ============================================================
+
+def active_list_items(db: Session, model, schema, *order_by) -> list:
+    """只查詢 schema 需要的欄位，回傳啟用中資料的 dict 列表"""
+    rows = db.query(*schema_columns(model, schema)).filter(model.is_active == True).order_by(*order_by)
+    return [r._asdict() for r in rows]
+
+
+@app.get("/api/bootstrap")
+def bootstrap(request: Request, db: Session = Depends(get_db)):
+    """
+    首頁載入時一次取回啟用中的工程、車輛、配比（取代三次個別請求）
+
+    只回傳首頁會用到的欄位；完整欄位請用各自的列表 API。
+    """
+    body = cached_json_bytes(("bootstrap",), lambda: {
+        "projects": active_list_items(db, Project, ProjectListItem, Project.code),
+        "trucks": active_list_items(db, Truck, TruckListItem, Truck.code),
+        "mixes": active_list_items(db, Mix, MixListItem, Mix.psi),
+    })
+    return with_etag(Response(body, media_type="application/json"), request)
+
+
 # ============================================================
 # 單價 API
 # ============================================================
@@ -681,28 +1201,31 @@ def list_prices(
     db: Session = Depends(get_db)
 ):
     """列出單價"""
-    query = db.query(ProjectPrice).filter(ProjectPrice.is_active == True)
+    # 以 JOIN 直接取出所需欄位，不建立 ProjectPrice/Project/Mix ORM 物件
+    query = db.query(
+        ProjectPrice.id,
+        ProjectPrice.project_id,
+        ProjectPrice.mix_id,
+        Project.code.label("project_code"),
+        Project.name.label("project_name"),
+        Mix.code.label("mix_code"),
+        Mix.psi.label("mix_psi"),
+        ProjectPrice.load_min_m3,
+        ProjectPrice.load_max_m3,
+        ProjectPrice.price_per_m3,
+        ProjectPrice.effective_from,
+        ProjectPrice.effective_to,
+        ProjectPrice.is_active,
+    ).join(Project, ProjectPrice.project_id == Project.id).join(
+        Mix, ProjectPrice.mix_id == Mix.id
+    ).filter(ProjectPrice.is_active == True)
     if project_id:
         query = query.filter(ProjectPrice.project_id == project_id)
-    
-    prices = query.all()
-    return [{
-        "id": p.id,
-        "project_id": p.project_id,
-        "mix_id": p.mix_id,
-        "project_code": p.project.code,
-        "project_name": p.project.name,
-        "mix_code": p.mix.code,
-        "mix_psi": p.mix.psi,
-        "load_min_m3": p.load_min_m3,
-        "load_max_m3": p.load_max_m3,
-        "price_per_m3": p.price_per_m3,
-        "effective_from": str(p.effective_from) if p.effective_from else None,
-        "effective_to": str(p.effective_to) if p.effective_to else None,
-        "is_active": p.is_active
-    } for p in prices]
-
-@app.post("/api/prices")
+
+    # 日期由 orjson 直接輸出為 ISO 格式
+    return ORJSONResponse([row._asdict() for row in query])
+
+@app.post("/api/prices", dependencies=WRITE_ROUTE)
 def create_price(data: PriceCreate, db: Session = Depends(get_db)):
     """新增/更新單價"""
     if data.load_min_m3 and data.load_max_m3 and data.load_min_m3 > data.load_max_m3:
@@ -720,7 +1243,7 @@ def create_price(data: PriceCreate, db: Session = Depends(get_db)):
 
     # 避免重疊區間
     existing_id = existing.id if existing else 0
-    overlap = db.query(ProjectPrice).filter(
+    overlap = db.query(exists().where(
         ProjectPrice.project_id == data.project_id,
         ProjectPrice.mix_id == data.mix_id,
         ProjectPrice.is_active == True,
@@ -733,7 +1256,7 @@ def create_price(data: PriceCreate, db: Session = Depends(get_db)):
                 or_(ProjectPrice.load_max_m3 == None, ProjectPrice.load_max_m3 >= (data.load_min_m3 or 0))
             )
         )
-    ).first()
+    )).scalar()
 
     if overlap and not existing:
         raise HTTPException(400, "載量區間與現有設定重疊，請調整後再試")
@@ -747,11 +1270,16 @@ def create_price(data: PriceCreate, db: Session = Depends(get_db)):
         price = ProjectPrice(**data.model_dump())
         db.add(price)
 
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # 同工程+配比+生效日+載量區間已有（停用的）紀錄，由唯一約束擋下
+        db.rollback()
+        raise HTTPException(400, "相同工程、配比、生效日與載量區間的單價已存在")
     return {"status": "ok"}
 
 
-@app.delete("/api/prices/{price_id}")
+@app.delete("/api/prices/{price_id}", dependencies=WRITE_ROUTE)
 def delete_price(price_id: int, db: Session = Depends(get_db)):
     """刪除工程單價"""
     price = db.query(ProjectPrice).filter(ProjectPrice.id == price_id).first()
@@ -776,7 +1304,9 @@ def delete_price(price_id: int, db: Session = Depends(get_db)):
 @app.post("/api/dispatch/preview")
 def preview_dispatch(batch: DispatchBatch, db: Session = Depends(get_db)):
     """預覽批次出車"""
+    begin_read_only(db)
     calc = DispatchCalculator(db)
+    calc.prefetch_for_rows([batch.project], [i.truck for i in batch.items], [i.psi for i in batch.items])
     results = []
     
     for idx, item in enumerate(batch.items):
@@ -791,49 +1321,101 @@ def preview_dispatch(batch: DispatchBatch, db: Session = Depends(get_db)):
         preview["row_index"] = idx
         results.append(preview)
     
-    return results
+    # 直接交給 orjson，略過 jsonable_encoder 逐物件走訪
+    return ORJSONResponse(results)
+
+# 批次寫入出車紀錄時每次 executemany 的筆數
+DISPATCH_INSERT_CHUNK = 500
 
-@app.post("/api/dispatch/commit")
-def commit_dispatch(batch: DispatchBatch, db: Session = Depends(get_db)):
-    """確認並寫入出車資料"""
+
+@app.post("/api/dispatch/commit", dependencies=WRITE_ROUTE)
+def commit_dispatch(batch: DispatchBatch, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
+    """
+    確認並寫入出車資料
+
+    各筆先算好欄位值，最後以 executemany 分批 INSERT、一次 commit，
+    不必逐筆建立 ORM 物件再 flush。
+    """
     calc = DispatchCalculator(db)
-    inserted = []
+    calc.prefetch_for_rows([batch.project], [i.truck for i in batch.items], [i.psi for i in batch.items])
+    rows = []
     errors = []
     
     for idx, item in enumerate(batch.items):
         try:
-            dispatch = calc.create_dispatch(
+            rows.append(calc.build_dispatch_row(
                 date_str=batch.date,
                 project_str=batch.project,
                 truck_str=item.truck,
                 load_m3=item.load,
                 mix_str=item.psi,
                 distance_km=item.distance
-            )
-            inserted.append(dispatch.dispatch_no)
+            ))
         except Exception as e:
             errors.append(f"第 {idx+1} 筆：{str(e)}")
     
-    if inserted:
+    if rows:
+        for start in range(0, len(rows), DISPATCH_INSERT_CHUNK):
+            db.execute(insert(Dispatch), rows[start:start + DISPATCH_INSERT_CHUNK])
         db.commit()
+        schedule_stats_refresh(background_tasks)
     
     return {
         "success": len(errors) == 0,
-        "inserted": len(inserted),
-        "dispatch_nos": inserted,
+        "inserted": len(rows),
+        "dispatch_nos": [r["dispatch_no"] for r in rows],
         "errors": errors
     }
 
 @app.get("/api/dispatches")
 def list_dispatches(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     project_code: Optional[str] = None,
     limit: int = Query(100, le=1000),
+    after_date: Optional[date] = None,
+    after_no: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """查詢出車紀錄"""
-    query = db.query(Dispatch).filter(Dispatch.status != "cancelled")
+    """
+    查詢出車紀錄
+
+    排序為 (日期 desc, 編號 asc)；翻頁時帶上一頁最後一筆的 after_date / after_no，
+    以 keyset 條件接續查詢，不必 OFFSET 掃過前面的資料。
+    """
+    if (after_date is None) != (after_no is None):
+        raise HTTPException(400, "after_date 與 after_no 需同時提供")
+
+    # 只取回應需要的欄位，略過 ORM 物件建立與 identity map
+    query = db.query(
+        Dispatch.id,
+        Dispatch.dispatch_no,
+        Dispatch.date,
+        Project.code.label("project_code"),
+        Project.name.label("project_name"),
+        Project.subsidy_threshold_m3,
+        Truck.plate_no.label("truck_plate"),
+        Truck.driver_name,
+        Truck.fuel_l_per_km,
+        Mix.psi.label("mix_psi"),
+        Dispatch.load_m3,
+        Dispatch.distance_km,
+        Dispatch.price_per_m3,
+        Dispatch.revenue,
+        Dispatch.subsidy,
+        Dispatch.total_revenue,
+        Dispatch.material_cost,
+        Dispatch.fuel_cost,
+        Dispatch.driver_cost,
+        Dispatch.total_cost,
+        Dispatch.gross_profit,
+        Dispatch.profit_margin,
+        Dispatch.fuel_price,
+    ).join(Project, Dispatch.project_id == Project.id).join(
+        Truck, Dispatch.truck_id == Truck.id
+    ).join(
+        Mix, Dispatch.mix_id == Mix.id
+    ).filter(Dispatch.status != "cancelled")
     
     if start_date:
         query = query.filter(Dispatch.date >= start_date)
@@ -843,19 +1425,54 @@ def list_dispatches(
         project = db.query(Project).filter(Project.code == project_code).first()
         if project:
             query = query.filter(Dispatch.project_id == project.id)
+    if after_date is not None:
+        query = query.filter(or_(
+            Dispatch.date < after_date,
+            and_(Dispatch.date == after_date, Dispatch.dispatch_no > after_no),
+        ))
     
-    dispatches = query.order_by(Dispatch.date.desc(), Dispatch.dispatch_no).limit(limit).all()
+    result = query.order_by(Dispatch.date.desc(), Dispatch.dispatch_no).limit(limit).yield_per(200)
+    return stream_json_array(result, _dispatch_row)
+
+
+# 出車明細公式模板（預先定義，避免每列重複解析 f-string）
+BASE_TMPL = "{load} m³ × {price} = {amt}"
+SUBSIDY_TMPL = "補貼 {subsidy}"
+REVENUE_TOTAL_TMPL = "{revenue} + {subsidy} = {total}"
+MATERIAL_TMPL = "{load} m³ × {unit} = {amt}"
+FUEL_TMPL = "{rt} km × {lpk} L/km × {fp} = {fc}"
+DRIVER_TMPL = "已紀錄每趟 {driver} 元"
+COST_TOTAL_TMPL = "{material} + {fuel} + {driver} = {total}"
+PROFIT_TMPL = "{revenue} - {cost} = {profit}"
+
+
+def _dispatch_row(d) -> dict:
+    """將 list_dispatches 的投影列轉為回應 dict（每個數值只 round 一次）"""
+    load = d.load_m3
+    price = round(d.price_per_m3 or 0, 2)
+    revenue = round(d.revenue or 0, 2)
+    subsidy = round(d.subsidy or 0, 2)
+    total_revenue = round(d.total_revenue or 0, 2)
+    material = round(d.material_cost or 0, 2)
+    material_unit = round((d.material_cost / load) if load else 0, 2)
+    round_trip = round(d.distance_km * 2, 2)
+    lpk = round(d.fuel_l_per_km or 0.5, 2)
+    fuel_price = round(d.fuel_price or 0, 2)
+    fuel = round(d.fuel_cost or 0, 2)
+    driver = round(d.driver_cost or 0, 2)
+    total_cost = round(d.total_cost or 0, 2)
+    subsidy_applied = (d.subsidy or 0) > 0
 
-    return [{
+    return {
         "id": d.id,
         "dispatch_no": d.dispatch_no,
-        "date": d.date.isoformat(),
-        "project_code": d.project.code,
-        "project_name": d.project.name,
-        "truck_plate": d.truck.plate_no,
-        "driver_name": d.truck.driver_name,
-        "mix_psi": d.mix.psi,
-        "load_m3": d.load_m3,
+        "date": d.date,
+        "project_code": d.project_code,
+        "project_name": d.project_name,
+        "truck_plate": d.truck_plate,
+        "driver_name": d.driver_name,
+        "mix_psi": d.mix_psi,
+        "load_m3": load,
         "distance_km": d.distance_km,
         "price_per_m3": d.price_per_m3,
         "revenue": d.revenue,
@@ -863,19 +1480,24 @@ def list_dispatches(
         "total_revenue": d.total_revenue,
         "revenue_details": {
             "base": {
-                "load_m3": d.load_m3,
-                "price_per_m3": round(d.price_per_m3 or 0, 2),
-                "formula": f"{d.load_m3} m³ × {round(d.price_per_m3 or 0, 2)} = {round((d.load_m3 or 0) * (d.price_per_m3 or 0), 2)}",
-                "amount": round(d.revenue or 0, 2)
+                "load_m3": load,
+                "price_per_m3": price,
+                "formula": BASE_TMPL.format_map({
+                    "load": load, "price": price,
+                    "amt": round((load or 0) * (d.price_per_m3 or 0), 2),
+                }),
+                "amount": revenue
             },
             "subsidy": {
-                "threshold_m3": d.project.subsidy_threshold_m3,
-                "subsidy_amount": round(d.subsidy or 0, 2),
-                "applied": (d.subsidy or 0) > 0,
-                "formula": f"補貼 {round(d.subsidy or 0, 2)}" if (d.subsidy or 0) > 0 else "未達補貼條件",
-                "amount": round(d.subsidy or 0, 2)
+                "threshold_m3": d.subsidy_threshold_m3,
+                "subsidy_amount": subsidy,
+                "applied": subsidy_applied,
+                "formula": SUBSIDY_TMPL.format_map({"subsidy": subsidy}) if subsidy_applied else "未達補貼條件",
+                "amount": subsidy
             },
-            "total_formula": f"{round(d.revenue or 0, 2)} + {round(d.subsidy or 0, 2)} = {round(d.total_revenue or 0, 2)}"
+            "total_formula": REVENUE_TOTAL_TMPL.format_map({
+                "revenue": revenue, "subsidy": subsidy, "total": total_revenue,
+            })
         },
         "material_cost": d.material_cost,
         "fuel_cost": d.fuel_cost,
@@ -883,36 +1505,51 @@ def list_dispatches(
         "total_cost": d.total_cost,
         "cost_details": {
             "material": {
-                "load_m3": d.load_m3,
-                "cost_per_m3": round((d.material_cost / d.load_m3) if d.load_m3 else 0, 2),
-                "formula": f"{d.load_m3} m³ × {round((d.material_cost / d.load_m3) if d.load_m3 else 0, 2)} = {round(d.material_cost or 0, 2)}",
-                "amount": round(d.material_cost or 0, 2)
+                "load_m3": load,
+                "cost_per_m3": material_unit,
+                "formula": MATERIAL_TMPL.format_map({"load": load, "unit": material_unit, "amt": material}),
+                "amount": material
             },
             "fuel": {
-                "distance_round_trip_km": round(d.distance_km * 2, 2),
-                "fuel_l_per_km": round(d.truck.fuel_l_per_km or 0.5, 2),
-                "fuel_price": round(d.fuel_price or 0, 2),
-                "formula": f"{round(d.distance_km * 2, 2)} km × {round(d.truck.fuel_l_per_km or 0.5, 2)} L/km × {round(d.fuel_price or 0, 2)} = {round(d.fuel_cost or 0, 2)}",
-                "amount": round(d.fuel_cost or 0, 2)
+                "distance_round_trip_km": round_trip,
+                "fuel_l_per_km": lpk,
+                "fuel_price": fuel_price,
+                "formula": FUEL_TMPL.format_map({"rt": round_trip, "lpk": lpk, "fp": fuel_price, "fc": fuel}),
+                "amount": fuel
             },
             "driver": {
                 "method": "recorded",
-                "per_trip_rate": round(d.driver_cost or 0, 2),
-                "formula": f"已紀錄每趟 {round(d.driver_cost or 0, 2)} 元",
-                "amount": round(d.driver_cost or 0, 2)
+                "per_trip_rate": driver,
+                "formula": DRIVER_TMPL.format_map({"driver": driver}),
+                "amount": driver
             },
-            "total_formula": f"{round(d.material_cost or 0, 2)} + {round(d.fuel_cost or 0, 2)} + {round(d.driver_cost or 0, 2)} = {round(d.total_cost or 0, 2)}"
+            "total_formula": COST_TOTAL_TMPL.format_map({
+                "material": material, "fuel": fuel, "driver": driver, "total": total_cost,
+            })
         },
         "gross_profit": d.gross_profit,
         "profit_margin": d.profit_margin,
-        "gross_profit_formula": f"{round(d.total_revenue or 0, 2)} - {round(d.total_cost or 0, 2)} = {round(d.gross_profit or 0, 2)}",
-    } for d in dispatches]
+        "gross_profit_formula": PROFIT_TMPL.format_map({
+            "revenue": total_revenue, "cost": total_cost,
+            "profit": round(d.gross_profit or 0, 2),
+        }),
+    }
 
 
-@app.put("/api/dispatches/{dispatch_id}")
-def update_dispatch(dispatch_id: int, data: DispatchUpdate, db: Session = Depends(get_db)):
+@app.put("/api/dispatches/{dispatch_id}", dependencies=WRITE_ROUTE)
+def update_dispatch(
+    dispatch_id: int,
+    data: DispatchUpdate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
     """更新出車紀錄並重算收入/成本/毛利"""
-    dispatch = db.query(Dispatch).filter(Dispatch.id == dispatch_id, Dispatch.status != "cancelled").first()
+    # 單筆查詢一併 JOIN 工程/車輛/配比，後續取用 relationship 不再各自查詢
+    dispatch = db.query(Dispatch).options(
+        joinedload(Dispatch.project),
+        joinedload(Dispatch.truck),
+        joinedload(Dispatch.mix),
+    ).filter(Dispatch.id == dispatch_id, Dispatch.status != "cancelled").first()
     if not dispatch:
         raise HTTPException(404, "出車紀錄不存在")
 
@@ -971,7 +1608,7 @@ def update_dispatch(dispatch_id: int, data: DispatchUpdate, db: Session = Depend
     dispatch.profit_margin = round(profit_margin, 2)
 
     db.commit()
-    db.refresh(dispatch)
+    schedule_stats_refresh(background_tasks)
 
     return {
         "id": dispatch.id,
@@ -991,8 +1628,8 @@ def update_dispatch(dispatch_id: int, data: DispatchUpdate, db: Session = Depend
     }
 
 
-@app.delete("/api/dispatches/{dispatch_id}")
-def delete_dispatch(dispatch_id: int, db: Session = Depends(get_db)):
+@app.delete("/api/dispatches/{dispatch_id}", dependencies=WRITE_ROUTE)
+def delete_dispatch(dispatch_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db)):
     """刪除出車紀錄"""
     dispatch = db.query(Dispatch).filter(Dispatch.id == dispatch_id).first()
     if not dispatch:
@@ -1000,6 +1637,7 @@ def delete_dispatch(dispatch_id: int, db: Session = Depends(get_db)):
 
     db.delete(dispatch)
     db.commit()
+    schedule_stats_refresh(background_tasks)
     return {"status": "deleted", "dispatch_no": dispatch.dispatch_no}
 
 
@@ -1012,9 +1650,24 @@ def list_daily_summaries(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     project_code: Optional[str] = None,
+    include_totals: bool = False,
     db: Session = Depends(get_db)
 ):
-    query = db.query(DailySummary).join(Project)
+    """
+    列出日彙總
+
+    include_totals=1 時改回傳 {items, totals}，車次與方數總計由資料庫 SUM，
+    前端不必再逐筆加總。
+    """
+    query = db.query(
+        DailySummary.id,
+        DailySummary.date,
+        Project.code.label("project_code"),
+        Project.name.label("project_name"),
+        DailySummary.psi,
+        DailySummary.total_m3,
+        DailySummary.trips,
+    ).join(Project, DailySummary.project_id == Project.id)
     if start_date:
         query = query.filter(DailySummary.date >= start_date)
     if end_date:
@@ -1022,22 +1675,22 @@ def list_daily_summaries(
     if project_code:
         query = query.filter(Project.code == project_code)
 
-    summaries = query.order_by(DailySummary.date.desc()).all()
-    results = []
-    for s in summaries:
-        results.append({
-            "id": s.id,
-            "date": s.date,
-            "project_code": s.project.code,
-            "project_name": s.project.name,
-            "psi": s.psi,
-            "total_m3": s.total_m3,
-            "trips": s.trips
+    if include_totals:
+        trips, m3 = query.with_entities(
+            func.coalesce(func.sum(DailySummary.trips), 0),
+            func.coalesce(func.sum(DailySummary.total_m3), 0.0),
+        ).one()
+        items = [s._asdict() for s in query.order_by(DailySummary.date.desc())]
+        return ORJSONResponse({
+            "items": items,
+            "totals": {"count": len(items), "trips": trips, "m3": round(m3, 2)},
         })
-    return results
 
+    result = query.order_by(DailySummary.date.desc()).yield_per(200)
+    return stream_json_array(result, lambda s: s._asdict())
 
-@app.post("/api/daily-summaries", response_model=DailySummaryResponse)
+
+@app.post("/api/daily-summaries", response_model=DailySummaryResponse, dependencies=WRITE_ROUTE)
 def create_daily_summary(data: DailySummaryCreate, db: Session = Depends(get_db)):
     project = get_project_by_code_or_name(db, data.project)
 
@@ -1061,7 +1714,6 @@ def create_daily_summary(data: DailySummaryCreate, db: Session = Depends(get_db)
         db.add(summary)
 
     db.commit()
-    db.refresh(summary)
 
     return {
         "id": summary.id,
@@ -1079,62 +1731,96 @@ def create_daily_summary(data: DailySummaryCreate, db: Session = Depends(get_db)
 # ============================================================
 
 
-def compute_financials(db: Session, start_dt: date, end_dt: date, dispatches: List[Dispatch], summaries: List[DailySummary]):
-    """依據指定期間重新計算收入、成本與毛利，並附上公式資訊。"""
-    driver_salary_setting = db.query(Setting).filter(Setting.key == "driver_daily_salary").first()
-    driver_count_setting = db.query(Setting).filter(Setting.key == "driver_count").first()
-    driver_daily_salary = float(driver_salary_setting.value) if driver_salary_setting else 0.0
-    default_driver_count = int(float(driver_count_setting.value)) if driver_count_setting else 0
-
-    attendance_records = db.query(DriverAttendance).filter(
+def aggregate_dispatch_stats(db: Session, *criteria):
+    """
+    依 (日期, 工程) 在 SQL 端彙總出車紀錄
+
+    回傳每組的車次、方數、單價×方數、材料成本×方數與油資，
+    報表不必再逐筆載入 Dispatch。
+    """
+    return db.query(
+        Dispatch.date,
+        Project.code.label("project_code"),
+        Project.name.label("project_name"),
+        func.count(Dispatch.id).label("trips"),
+        func.coalesce(func.sum(Dispatch.load_m3), 0).label("m3"),
+        func.coalesce(func.sum(Dispatch.load_m3 * func.coalesce(Dispatch.price_per_m3, 0)), 0).label("price_volume"),
+        func.coalesce(func.sum(Dispatch.load_m3 * func.coalesce(Mix.material_cost_per_m3, 0)), 0).label("material_volume_cost"),
+        func.coalesce(func.sum(Dispatch.fuel_cost), 0).label("fuel_cost"),
+    ).join(Project, Dispatch.project_id == Project.id).outerjoin(
+        Mix, Dispatch.mix_id == Mix.id
+    ).filter(
+        Dispatch.status != "cancelled", *criteria
+    ).group_by(
+        Dispatch.date, Project.id, Project.code, Project.name
+    ).order_by(Dispatch.date, Project.code).all()
+
+
+def compute_financials(db: Session, start_dt: date, end_dt: date, dispatch_stats: list, summaries: list):
+    """
+    依據指定期間重新計算收入、成本與毛利，並附上公式資訊。
+
+    dispatch_stats 為 aggregate_dispatch_stats 的彙總結果；
+    summaries 為 (DailySummary, Project, project_code, project_name) 列。
+    """
+    settings = settings_cache.get_all(db)
+    driver_salary_setting = settings.get("driver_daily_salary")
+    driver_count_setting = settings.get("driver_count")
+    driver_daily_salary = float(driver_salary_setting) if driver_salary_setting is not None else 0.0
+    default_driver_count = int(float(driver_count_setting)) if driver_count_setting is not None else 0
+
+    driver_count_by_date = dict(db.query(DriverAttendance.date, DriverAttendance.driver_count).filter(
         DriverAttendance.date >= start_dt,
         DriverAttendance.date <= end_dt
-    ).all()
-    driver_count_by_date = {a.date: a.driver_count for a in attendance_records}
+    ).all())
 
     calc = DispatchCalculator(db)
-
-    # 按日期彙總車次，供司機成本分攤
-    trips_by_date = {}
-    for d in dispatches:
-        trips_by_date[d.date] = trips_by_date.get(d.date, 0) + 1
-    for s in summaries:
-        trips_by_date[s.date] = trips_by_date.get(s.date, 0) + (s.trips or 0)
+    mix_by_psi = {}
+
+    # 按日期彙總車次，供司機成本分攤；同時記錄各工程每日車次
+    trips_by_date = defaultdict(int)
+    project_trips_by_date = defaultdict(int)
+    for row in dispatch_stats:
+        trips_by_date[row.date] += row.trips
+        project_trips_by_date[(row.date, row.project_code)] += row.trips
+    for s, _, code, _ in summaries:
+        trips_by_date[s.date] += s.trips or 0
+        project_trips_by_date[(s.date, code)] += s.trips or 0
 
     # 按工程彙總資料
-    project_stats = {}
-
-    def ensure_project_entry(project: Project):
-        if project.code not in project_stats:
-            project_stats[project.code] = {
-                "project_name": project.name,
-                "trips": 0,
-                "m3": 0.0,
-                "price_volume": 0.0,
-                "material_volume_cost": 0.0,
-                "fuel_cost": 0.0,
-                "driver_cost": 0.0,
-            }
-
-    for d in dispatches:
-        ensure_project_entry(d.project)
-        project_stats[d.project.code]["trips"] += 1
-        project_stats[d.project.code]["m3"] += d.load_m3 or 0
-        project_stats[d.project.code]["price_volume"] += (d.load_m3 or 0) * (d.price_per_m3 or 0)
-        project_stats[d.project.code]["material_volume_cost"] += (d.load_m3 or 0) * (d.mix.material_cost_per_m3 or 0)
-        project_stats[d.project.code]["fuel_cost"] += d.fuel_cost or 0
-
-    for s in summaries:
-        ensure_project_entry(s.project)
-        project_stats[s.project.code]["trips"] += s.trips or 0
-        project_stats[s.project.code]["m3"] += s.total_m3 or 0
+    project_stats = defaultdict(lambda: {
+        "project_name": "",
+        "trips": 0,
+        "m3": 0.0,
+        "price_volume": 0.0,
+        "material_volume_cost": 0.0,
+        "fuel_cost": 0.0,
+        "driver_cost": 0.0,
+    })
+
+    for row in dispatch_stats:
+        stat = project_stats[row.project_code]
+        stat["project_name"] = row.project_name
+        stat["trips"] += row.trips
+        stat["m3"] += row.m3
+        stat["price_volume"] += row.price_volume
+        stat["material_volume_cost"] += row.material_volume_cost
+        stat["fuel_cost"] += row.fuel_cost
+
+    for s, project, code, name in summaries:
+        stat = project_stats[code]
+        stat["project_name"] = name
+        stat["trips"] += s.trips or 0
+        stat["m3"] += s.total_m3 or 0
 
         # 透過 psi 找配比和單價
         mix = None
         if s.psi:
-            mix = db.query(Mix).filter(Mix.psi == s.psi, Mix.is_active == True).first()
-        if not mix and s.project.default_mix:
-            mix = s.project.default_mix
+            if s.psi not in mix_by_psi:
+                mix_by_psi[s.psi] = db.query(Mix).filter(Mix.psi == s.psi, Mix.is_active == True).first()
+            mix = mix_by_psi[s.psi]
+        if not mix and project.default_mix:
+            mix = project.default_mix
         if not mix:
             try:
                 mix = calc.find_mix(calc.get_setting("default_psi", "3000"))
@@ -1142,11 +1828,11 @@ def compute_financials(db: Session, start_dt: date, end_dt: date, dispatches: Li
                 mix = None
 
         if mix:
-            project_stats[s.project.code]["material_volume_cost"] += (s.total_m3 or 0) * (mix.material_cost_per_m3 or 0)
+            stat["material_volume_cost"] += (s.total_m3 or 0) * (mix.material_cost_per_m3 or 0)
             try:
                 avg_load = (s.total_m3 or 0) / (s.trips or 1)
-                price = calc.get_price(s.project, mix, s.date, avg_load)
-                project_stats[s.project.code]["price_volume"] += (s.total_m3 or 0) * price
+                price = calc.get_price(project, mix, s.date, avg_load)
+                stat["price_volume"] += (s.total_m3 or 0) * price
             except Exception:
                 pass
 
@@ -1158,9 +1844,7 @@ def compute_financials(db: Session, start_dt: date, end_dt: date, dispatches: Li
             continue
         per_trip = total_driver_salary / total_trips
         for code, stat in project_stats.items():
-            # 只把該日期的車次計入 (需要再查一次)
-            project_trip_on_day = sum(1 for d in dispatches if d.date == day and d.project.code == code)
-            project_trip_on_day += sum(s.trips or 0 for s in summaries if s.date == day and s.project.code == code)
+            project_trip_on_day = project_trips_by_date.get((day, code))
             if project_trip_on_day:
                 stat["driver_cost"] += per_trip * project_trip_on_day
 
@@ -1229,7 +1913,83 @@ def compute_financials(db: Session, start_dt: date, end_dt: date, dispatches: Li
 
     return {"totals": totals, "projects": project_formatted}
 
+
+def _accumulate_report_buckets(dispatch_rows, summary_rows, key, dispatch_fields, name_attr=None) -> dict:
+    """
+    合併出車與日彙總的分組結果
+
+    dispatch_rows 每列需有 trips、m3 與 dispatch_fields 各欄位；
+    summary_rows 每列需有 trips、m3。以 key(row) 分組累加，
+    有 name_attr 時另記 project_name。
+    """
+    empty = {"trips": 0, "m3": 0, **{f: 0 for f in dispatch_fields}}
+    if name_attr:
+        empty = {"project_name": "", **empty}
+    buckets = defaultdict(lambda: dict(empty))
+
+    for row in dispatch_rows:
+        bucket = buckets[key(row)]
+        if name_attr:
+            bucket["project_name"] = getattr(row, name_attr)
+        bucket["trips"] += row.trips
+        bucket["m3"] += row.m3
+        for f in dispatch_fields:
+            bucket[f] += getattr(row, f)
+
+    for row in summary_rows:
+        bucket = buckets[key(row)]
+        if name_attr:
+            bucket["project_name"] = getattr(row, name_attr)
+        bucket["trips"] += row.trips
+        bucket["m3"] += row.m3
+
+    return dict(buckets)
+
+
+def cached_report(is_historical):
+    """
+    報表回應快取裝飾器
+
+    以函式名稱與查詢參數為 key；is_historical(**params) 為真時使用較長的 TTL。
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            params = {k: v for k, v in kwargs.items() if k != "db"}
+            key = (func.__name__, tuple(sorted(params.items())))
+            body = report_cache.get(key)
+            if body is not None:
+                return Response(body, media_type="application/json")
+
+            generation = report_cache.generation
+            response = ORJSONResponse(func(*args, **kwargs))
+            try:
+                historical = is_historical(**params)
+            except (TypeError, ValueError):
+                historical = False
+            ttl = REPORT_CACHE_TTL_PAST if historical else REPORT_CACHE_TTL_CURRENT
+            report_cache.set(key, response.body, ttl, generation)
+            return response
+        return wrapper
+    return decorator
+
+
+def _daily_range_closed(date_str=None, start_date=None, end_date=None) -> bool:
+    end = end_date or start_date or date_str
+    return bool(end) and date.fromisoformat(end) < date.today()
+
+
+def _month_closed(year: int, month: int) -> bool:
+    today = date.today()
+    return (year, month) < (today.year, today.month)
+
+
+def _project_range_closed(project_code: str, start_date=None, end_date=None, **_) -> bool:
+    return end_date is not None and end_date < date.today()
+
+
 @app.get("/api/reports/daily")
+@cached_report(_daily_range_closed)
 def report_daily(
     date_str: Optional[str] = None,
     start_date: Optional[str] = None,
@@ -1251,17 +2011,22 @@ def report_daily(
     start_dt = parse(start_date)
     end_dt = parse(end_date)
 
-    dispatches = db.query(Dispatch).filter(
+    dispatch_stats = aggregate_dispatch_stats(
+        db,
         Dispatch.date >= start_dt,
         Dispatch.date <= end_dt,
-        Dispatch.status != "cancelled"
-    ).all()
-    summaries = db.query(DailySummary).join(Project).filter(
+    )
+    # 工程代碼/名稱直接由查詢帶出，迴圈中不走 relationship 屬性
+    summaries = db.query(
+        DailySummary, Project, Project.code.label("project_code"), Project.name.label("project_name")
+    ).join(Project, DailySummary.project_id == Project.id).options(
+        selectinload(Project.default_mix),
+    ).filter(
         DailySummary.date >= start_dt,
         DailySummary.date <= end_dt
     ).all()
 
-    financials = compute_financials(db, start_dt, end_dt, dispatches, summaries)
+    financials = compute_financials(db, start_dt, end_dt, dispatch_stats, summaries)
 
     return {
         "summary": financials["totals"],
@@ -1270,74 +2035,86 @@ def report_daily(
     }
 
 @app.get("/api/reports/monthly")
+@cached_report(_month_closed)
 def report_monthly(
     year: int,
     month: int,
     db: Session = Depends(get_db)
 ):
-    """月報表"""
-    dispatches = db.query(Dispatch).filter(
-        extract('year', Dispatch.date) == year,
-        extract('month', Dispatch.date) == month,
-        Dispatch.status != "cancelled"
-    ).all()
-    summaries = db.query(DailySummary).join(Project).filter(
-        extract('year', DailySummary.date) == year,
-        extract('month', DailySummary.date) == month,
-    ).all()
+    """
+    月報表（彙總皆在 SQL 端以 GROUP BY 完成）
+
+    出車部分讀每日 × 工程的彙總（PostgreSQL 為 materialized view），
+    掃描量為天數 × 工程數而非出車筆數。
+    """
+    if not 1 <= month <= 12:
+        raise HTTPException(400, "月份需介於 1-12")
+
+    # 以半開區間篩選日期，可使用 date 索引做範圍掃描
+    month_start = date(year, month, 1)
+    month_end = date(year + (month == 12), month % 12 + 1, 1)
+
+    stats = daily_project_stats(db.get_bind())
+    dispatch_filter = (
+        stats.c.date >= month_start,
+        stats.c.date < month_end,
+    )
+    summary_filter = (
+        DailySummary.date >= month_start,
+        DailySummary.date < month_end,
+    )
+    dispatch_sums = (
+        func.coalesce(func.sum(stats.c.trips), 0).label("trips"),
+        func.coalesce(func.sum(stats.c.m3), 0).label("m3"),
+        func.coalesce(func.sum(stats.c.revenue), 0).label("revenue"),
+        func.coalesce(func.sum(stats.c.cost), 0).label("cost"),
+        func.coalesce(func.sum(stats.c.profit), 0).label("profit"),
+    )
+    summary_sums = (
+        func.coalesce(func.sum(DailySummary.trips), 0).label("trips"),
+        func.coalesce(func.sum(DailySummary.total_m3), 0).label("m3"),
+    )
 
+    # 按工程統計
+    dispatch_by_project = db.query(
+        Project.code, Project.name, *dispatch_sums
+    ).select_from(stats).join(Project, stats.c.project_id == Project.id).filter(
+        *dispatch_filter
+    ).group_by(Project.id, Project.code, Project.name).all()
+    summary_by_project = db.query(
+        Project.code, Project.name, *summary_sums
+    ).join(Project, DailySummary.project_id == Project.id).filter(
+        *summary_filter
+    ).group_by(Project.id, Project.code, Project.name).all()
+    by_project = _accumulate_report_buckets(
+        dispatch_by_project, summary_by_project,
+        key=lambda row: row.code,
+        dispatch_fields=("revenue", "cost", "profit"),
+        name_attr="name",
+    )
+
+    # 全月總計直接由各工程小計加總（不另外查總和）
     summary = {
         "year": year,
         "month": month,
-        "total_trips": len(dispatches) + sum(s.trips for s in summaries),
-        "total_m3": sum(d.load_m3 for d in dispatches) + sum(s.total_m3 for s in summaries),
-        "total_revenue": sum(d.total_revenue for d in dispatches),
-        "total_cost": sum(d.total_cost for d in dispatches),
-        "gross_profit": sum(d.gross_profit for d in dispatches),
+        "total_trips": sum(b["trips"] for b in by_project.values()),
+        "total_m3": sum(b["m3"] for b in by_project.values()),
+        "total_revenue": sum(b["revenue"] for b in by_project.values()),
+        "total_cost": sum(b["cost"] for b in by_project.values()),
+        "gross_profit": sum(b["profit"] for b in by_project.values()),
     }
 
-    # 按工程統計
-    by_project = {}
-    for d in dispatches:
-        key = d.project.code
-        if key not in by_project:
-            by_project[key] = {
-                "project_name": d.project.name,
-                "trips": 0, "m3": 0, "revenue": 0, "cost": 0, "profit": 0
-            }
-        by_project[key]["trips"] += 1
-        by_project[key]["m3"] += d.load_m3
-        by_project[key]["revenue"] += d.total_revenue
-        by_project[key]["cost"] += d.total_cost
-        by_project[key]["profit"] += d.gross_profit
-
-    for s in summaries:
-        key = s.project.code
-        if key not in by_project:
-            by_project[key] = {
-                "project_name": s.project.name,
-                "trips": 0, "m3": 0, "revenue": 0, "cost": 0, "profit": 0
-            }
-        by_project[key]["trips"] += s.trips
-        by_project[key]["m3"] += s.total_m3
-
-    # 按日統計
-    by_day = {}
-    for d in dispatches:
-        key = d.date.day
-        if key not in by_day:
-            by_day[key] = {"trips": 0, "m3": 0, "revenue": 0, "profit": 0}
-        by_day[key]["trips"] += 1
-        by_day[key]["m3"] += d.load_m3
-        by_day[key]["revenue"] += d.total_revenue
-        by_day[key]["profit"] += d.gross_profit
-
-    for s in summaries:
-        key = s.date.day
-        if key not in by_day:
-            by_day[key] = {"trips": 0, "m3": 0, "revenue": 0, "profit": 0}
-        by_day[key]["trips"] += s.trips
-        by_day[key]["m3"] += s.total_m3
+    # 按日統計：直接以 date 欄位分組（不包函式），日數在 Python 端取出
+    by_day = _accumulate_report_buckets(
+        db.query(stats.c.date, *dispatch_sums).select_from(stats).filter(
+            *dispatch_filter
+        ).group_by(stats.c.date).all(),
+        db.query(DailySummary.date, *summary_sums).filter(
+            *summary_filter
+        ).group_by(DailySummary.date).all(),
+        key=lambda row: row.date.day,
+        dispatch_fields=("revenue", "profit"),
+    )
 
     return {
         "summary": summary,
@@ -1346,29 +2123,57 @@ def report_monthly(
     }
 
 @app.get("/api/reports/project/{project_code}")
+@cached_report(_project_range_closed)
 def report_project(
     project_code: str,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    page: int = Query(0, ge=0),
+    page_size: int = Query(500, ge=1, le=1000),
     db: Session = Depends(get_db)
 ):
-    """工程報表"""
-    project = db.query(Project).filter(Project.code == project_code).first()
+    """
+    工程報表
+
+    出車明細只回傳第 page 頁（每頁 page_size 筆），回應與快取大小不隨工程歷史增長；
+    總計改由 SQL 彙總，不受分頁影響。
+    """
+    project = db.query(
+        Project.id, Project.code, Project.name, Project.default_distance_km
+    ).filter(Project.code == project_code).first()
     if not project:
         raise HTTPException(404, "工程不存在")
-    
-    query = db.query(Dispatch).filter(
+
+    dispatch_filter = [
         Dispatch.project_id == project.id,
-        Dispatch.status != "cancelled"
-    )
-    
+        Dispatch.status != "cancelled",
+    ]
+    # 以 date 比較，PostgreSQL 可直接以 date 索引做範圍掃描
     if start_date:
-        query = query.filter(Dispatch.date >= start_date)
+        dispatch_filter.append(Dispatch.date >= start_date)
     if end_date:
-        query = query.filter(Dispatch.date <= end_date)
-
-    dispatches = query.order_by(Dispatch.date).all()
-    summaries = db.query(DailySummary).filter(
+        dispatch_filter.append(Dispatch.date <= end_date)
+
+    # 只取報表用到的欄位，略過完整 ORM 物件建立
+    query = db.query(
+        Dispatch.date,
+        Dispatch.dispatch_no,
+        Truck.plate_no,
+        Truck.driver_name,
+        Dispatch.load_m3,
+        Dispatch.total_revenue,
+        Dispatch.total_cost,
+        Dispatch.gross_profit,
+    ).outerjoin(Truck, Dispatch.truck_id == Truck.id).filter(
+        *dispatch_filter
+    ).order_by(Dispatch.date, Dispatch.dispatch_no)
+
+    summaries = db.query(
+        DailySummary.date,
+        DailySummary.psi,
+        DailySummary.total_m3,
+        DailySummary.trips,
+    ).filter(
         DailySummary.project_id == project.id
     )
     if start_date:
@@ -1377,6 +2182,45 @@ def report_project(
         summaries = summaries.filter(DailySummary.date <= end_date)
     summaries = summaries.order_by(DailySummary.date).all()
 
+    # 總計與平均毛利率由資料庫彙總，與是否分頁無關
+    totals = db.query(
+        func.count(Dispatch.id).label("trips"),
+        func.coalesce(func.sum(Dispatch.load_m3), 0).label("m3"),
+        func.coalesce(func.sum(Dispatch.total_revenue), 0).label("revenue"),
+        func.coalesce(func.sum(Dispatch.total_cost), 0).label("cost"),
+        func.coalesce(func.sum(Dispatch.gross_profit), 0).label("profit"),
+        func.avg(Dispatch.profit_margin).label("avg_margin"),
+    ).filter(*dispatch_filter).one()
+
+    # 多取一筆判斷是否還有下一頁
+    rows = query.offset(page * page_size).limit(page_size + 1).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    dispatch_rows = [{
+        "date": d.date,
+        "dispatch_no": d.dispatch_no,
+        "truck": d.plate_no,
+        "driver": d.driver_name,
+        "load_m3": d.load_m3,
+        "revenue": d.total_revenue,
+        "cost": d.total_cost,
+        "profit": d.gross_profit,
+    } for d in rows]
+
+    total_trips = totals.trips
+    total_m3 = totals.m3
+    summary_rows = []
+    for s in summaries:
+        total_trips += s.trips
+        total_m3 += s.total_m3
+        summary_rows.append({
+            "date": s.date,
+            "psi": s.psi,
+            "total_m3": s.total_m3,
+            "trips": s.trips
+        })
+
     return {
         "project": {
             "code": project.code,
@@ -1384,29 +2228,17 @@ def report_project(
             "default_distance_km": project.default_distance_km,
         },
         "summary": {
-            "total_trips": len(dispatches) + sum(s.trips for s in summaries),
-            "total_m3": sum(d.load_m3 for d in dispatches) + sum(s.total_m3 for s in summaries),
-            "total_revenue": sum(d.total_revenue for d in dispatches),
-            "total_cost": sum(d.total_cost for d in dispatches),
-            "gross_profit": sum(d.gross_profit for d in dispatches),
-            "avg_profit_margin": sum(d.profit_margin for d in dispatches) / len(dispatches) if dispatches else 0,
+            "total_trips": total_trips,
+            "total_m3": total_m3,
+            "total_revenue": totals.revenue,
+            "total_cost": totals.cost,
+            "gross_profit": totals.profit,
+            "avg_profit_margin": totals.avg_margin or 0,
         },
-        "dispatches": [{
-            "date": d.date.isoformat(),
-            "dispatch_no": d.dispatch_no,
-            "truck": d.truck.plate_no,
-            "driver": d.truck.driver_name,
-            "load_m3": d.load_m3,
-            "revenue": d.total_revenue,
-            "cost": d.total_cost,
-            "profit": d.gross_profit,
-        } for d in dispatches],
-        "daily_summaries": [{
-            "date": s.date.isoformat(),
-            "psi": s.psi,
-            "total_m3": s.total_m3,
-            "trips": s.trips
-        } for s in summaries]
+        "dispatches": dispatch_rows,
+        "daily_summaries": summary_rows,
+        "page": page,
+        "has_more": has_more,
     }
 
 
@@ -1417,11 +2249,11 @@ def report_project(
 @app.get("/api/settings", response_model=List[SettingResponse])
 def list_settings(db: Session = Depends(get_db)):
     """列出所有設定"""
-    settings = db.query(Setting).all()
-    return [SettingResponse(key=s.key, value=s.value) for s in settings]
+    settings = settings_cache.get_all(db)
+    return ORJSONResponse([{"key": k, "value": v} for k, v in settings.items()])
 
 
-@app.put("/api/settings/{key}")
+@app.put("/api/settings/{key}", dependencies=WRITE_ROUTE)
 def update_setting(key: str, data: SettingUpdate, db: Session = Depends(get_db)):
     """更新設定"""
     setting = db.query(Setting).filter(Setting.key == key).first()
@@ -1432,6 +2264,7 @@ def update_setting(key: str, data: SettingUpdate, db: Session = Depends(get_db))
         db.add(setting)
 
     db.commit()
+    settings_cache.clear()
     return {"status": "ok", "key": key, "value": setting.value}
 
 
@@ -1446,17 +2279,16 @@ def list_driver_attendance(
     end_date: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    query = db.query(DriverAttendance)
+    query = db.query(*schema_columns(DriverAttendance, DriverAttendanceResponse))
     if start_date:
         query = query.filter(DriverAttendance.date >= date.fromisoformat(start_date))
     if end_date:
         query = query.filter(DriverAttendance.date <= date.fromisoformat(end_date))
 
-    records = query.order_by(DriverAttendance.date.desc()).all()
-    return records
+    return orm_list_response(query.order_by(DriverAttendance.date.desc()), DriverAttendanceResponse)
 
 
-@app.post("/api/driver-attendance", response_model=DriverAttendanceResponse)
+@app.post("/api/driver-attendance", response_model=DriverAttendanceResponse, dependencies=WRITE_ROUTE)
 def upsert_driver_attendance(data: DriverAttendanceCreate, db: Session = Depends(get_db)):
     record = db.query(DriverAttendance).filter(DriverAttendance.date == data.date).first()
     if record:
@@ -1471,11 +2303,10 @@ def upsert_driver_attendance(data: DriverAttendanceCreate, db: Session = Depends
         db.add(record)
 
     db.commit()
-    db.refresh(record)
     return record
 
 
-@app.delete("/api/driver-attendance/{day}")
+@app.delete("/api/driver-attendance/{day}", dependencies=WRITE_ROUTE)
 def delete_driver_attendance(day: str, db: Session = Depends(get_db)):
     try:
         target_date = date.fromisoformat(day)
@@ -1497,26 +2328,184 @@ def delete_driver_attendance(day: str, db: Session = Depends(get_db)):
 
 @app.post("/api/dispatch/upload-csv")
 async def upload_csv(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     default_date: Optional[str] = Form(None),
     default_project: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """上傳 CSV"""
-    content = await file.read()
-    
+    """
+    上傳 CSV
+
+    超過 CSV_JOB_ROW_THRESHOLD 列的檔案改在背景處理，先回傳 job_id，
+    再以 GET /api/dispatch/upload-csv/{job_id} 查詢結果。
+    """
+    # 上傳內容已由 UploadFile 暫存（大檔落在磁碟），不整份讀進記憶體
+    if await run_in_threadpool(_count_lines, file.file) > CSV_JOB_ROW_THRESHOLD:
+        if not _reserve_csv_job_slot():
+            raise HTTPException(503, "背景 CSV 工作已滿，請稍後再試")
+        # 請求結束後 UploadFile 即關閉，背景工作改讀複製出的暫存檔
+        path = await run_in_threadpool(_spool_upload, file.file)
+        job_id = uuid.uuid4().hex
+        csv_jobs[job_id] = {"job_id": job_id, "status": "pending"}
+        background_tasks.add_task(_run_csv_job, job_id, path, default_date, default_project)
+        return csv_jobs[job_id]
+
+    # 解析與逐筆預覽皆為同步 DB / pandas 運算，移到 threadpool 以免阻塞 event loop
+    result = await run_in_threadpool(_build_csv_previews, file.file, default_date, default_project, db)
+    # 預覽可達數千筆，直接交給 orjson，略過 jsonable_encoder 逐物件走訪
+    return ORJSONResponse(result)
+
+
+@app.get("/api/dispatch/upload-csv/{job_id}")
+def get_csv_job(job_id: str):
+    """查詢背景 CSV 預覽工作"""
+    _prune_csv_jobs()
+    job = csv_jobs.get(job_id)
+    if not job:
+        raise HTTPException(404, "工作不存在")
+    return ORJSONResponse(job)
+
+
+# 背景 CSV 預覽工作（存在 process 內；多 worker 時需固定送到同一 worker 查詢）
+CSV_JOB_ROW_THRESHOLD = int(os.environ.get("CSV_JOB_ROW_THRESHOLD", "2000"))
+CSV_JOB_MAX = 100
+# 完成（done / error）的工作保留秒數，逾時連同預覽結果一起移除
+CSV_JOB_TTL = float(os.environ.get("CSV_JOB_TTL", "600"))
+# CSV 每次解析的列數；記憶體用量只與此值相關，與檔案大小無關
+CSV_CHUNK_ROWS = int(os.environ.get("CSV_CHUNK_ROWS", "2000"))
+
+# CSV 欄位對照（中文欄名 → 內部欄名）
+CSV_COLUMN_MAP = {
+    "工程": "project", "project_name": "project",
+    "日期": "date", "車號": "truck", "司機": "truck",
+    "載量": "load", "強度": "psi", "距離": "distance"
+}
+# 文字欄位一律以字串讀入：逐塊讀取時型別推斷各塊獨立，
+# 例如某塊強度有空白會被推成 float（"4000.0"），結果不能隨分塊位置改變
+CSV_TEXT_COLUMNS = {"project", "date", "truck", "psi"}
+CSV_TEXT_DTYPES = {
+    name: str
+    for name in CSV_TEXT_COLUMNS | {k for k, v in CSV_COLUMN_MAP.items() if v in CSV_TEXT_COLUMNS}
+}
+csv_jobs = {}
+# job_id → 完成工作的到期時間（time.monotonic）；執行中的工作不在此表，不會被移除
+csv_job_expires = {}
+
+
+def _prune_csv_jobs():
+    """移除已到期的完成工作"""
+    now = time.monotonic()
+    for job_id in [k for k, expires_at in list(csv_job_expires.items()) if expires_at < now]:
+        csv_job_expires.pop(job_id, None)
+        csv_jobs.pop(job_id, None)
+
+
+def _reserve_csv_job_slot() -> bool:
+    """
+    確保還能新增背景工作
+
+    先移除到期的完成工作；仍滿時只淘汰最早完成的工作，
+    執行中的工作一律保留（輪詢中的前端才不會拿到 404）。
+    """
+    _prune_csv_jobs()
+    while len(csv_jobs) >= CSV_JOB_MAX:
+        if not csv_job_expires:
+            return False
+        job_id = min(csv_job_expires, key=csv_job_expires.get)
+        csv_job_expires.pop(job_id, None)
+        csv_jobs.pop(job_id, None)
+    return True
+
+
+def _count_lines(f) -> int:
+    """以固定大小區塊計算上傳檔的行數，完成後倒回開頭"""
+    f.seek(0)
+    n = 0
+    for block in iter(lambda: f.read(1 << 20), b""):
+        n += block.count(b"\n")
+    f.seek(0)
+    return n
+
+
+def _spool_upload(f) -> str:
+    """把上傳檔複製成暫存檔，回傳路徑（由背景工作讀完後刪除）"""
+    f.seek(0)
+    with tempfile.NamedTemporaryFile(prefix="csv_job_", suffix=".csv", delete=False) as tmp:
+        shutil.copyfileobj(f, tmp)
+    return tmp.name
+
+
+def _run_csv_job(job_id: str, path: str, default_date: Optional[str], default_project: Optional[str]):
+    """背景執行 CSV 預覽，使用獨立的 Session（請求的 Session 已關閉）"""
+    job = csv_jobs.get(job_id)
+    if job is None:
+        os.remove(path)
+        return
+    db = SessionLocal()
+    try:
+        job["result"] = _build_csv_previews(path, default_date, default_project, db)
+        job["status"] = "done"
+    except HTTPException as e:
+        job["status"] = "error"
+        job["error"] = e.detail
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+    finally:
+        csv_job_expires[job_id] = time.monotonic() + CSV_JOB_TTL
+        db.rollback()
+        db.close()
+        os.remove(path)
+
+
+def _build_csv_previews(
+    source,
+    default_date: Optional[str],
+    default_project: Optional[str],
+    db: Session
+) -> dict:
+    """
+    逐塊解析 CSV（source 為檔案物件或路徑）並產生每筆出車預覽（同步執行）
+
+    每次只讀 CSV_CHUNK_ROWS 列；計算器跨區塊共用，已比對的工程/車輛/單價不重查。
+    """
+    # pandas 載入成本高，只在實際上傳時才匯入，縮短 worker 啟動時間與常駐記憶體
+    import pandas as pd
+
     try:
-        df = pd.read_csv(io.BytesIO(content))
+        reader = pd.read_csv(source, chunksize=CSV_CHUNK_ROWS, dtype=CSV_TEXT_DTYPES)
     except Exception as e:
         raise HTTPException(400, f"無法讀取 CSV：{e}")
-    
-    # 欄位對照
-    col_map = {
-        "工程": "project", "project_name": "project",
-        "日期": "date", "車號": "truck", "司機": "truck",
-        "載量": "load", "強度": "psi", "距離": "distance"
-    }
-    df.rename(columns=col_map, inplace=True)
+
+    begin_read_only(db)
+    calc = DispatchCalculator(db)
+    results = []
+    total = 0
+    with reader:
+        while True:
+            try:
+                df = next(reader)
+            except StopIteration:
+                break
+            except Exception as e:
+                raise HTTPException(400, f"無法讀取 CSV：{e}")
+            results.extend(_preview_csv_chunk(df, default_date, default_project, calc))
+            total += len(df)
+
+    return {"previews": results, "total": total}
+
+
+def _preview_csv_chunk(
+    df,
+    default_date: Optional[str],
+    default_project: Optional[str],
+    calc: DispatchCalculator
+) -> list:
+    """產生單一 CSV 區塊的出車預覽；row_index 沿用整份檔案的列號"""
+    import pandas as pd
+
+    df.rename(columns=CSV_COLUMN_MAP, inplace=True)
     
     # 填入預設值
     if "date" not in df.columns and default_date:
@@ -1530,485 +2519,77 @@ async def upload_csv(
     if missing:
         raise HTTPException(400, f"缺少欄位：{missing}")
     
-    # 預覽
-    calc = DispatchCalculator(db)
+    # 先整欄轉型（缺值整欄換成 None），迴圈內不再逐格呼叫 pandas
+    def numeric_or_none(col) -> list:
+        values = pd.to_numeric(col, errors="coerce").astype(float)
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    n = len(df)
+    dates = df["date"].astype(str).tolist()
+    projects = df["project"].astype(str).tolist()
+    trucks = df["truck"].astype(str).tolist()
+    loads = numeric_or_none(df["load"])
+    if "psi" in df.columns:
+        psis = df["psi"].astype(str).astype(object).where(df["psi"].notna(), None).tolist()
+    else:
+        psis = [None] * n
+    distances = numeric_or_none(df["distance"]) if "distance" in df.columns else [None] * n
+
+    # 預覽前先批次比對工程/車輛並載入單價，逐筆預覽不再查詢
+    calc.prefetch_for_rows(projects, trucks, psis)
     results = []
-    
-    for idx, row in df.iterrows():
-        preview = calc.preview_dispatch(
-            date_str=str(row["date"]),
-            project_str=str(row["project"]),
-            truck_str=str(row["truck"]),
-            load_m3=float(row["load"]),
-            mix_str=str(row.get("psi", "")) if pd.notna(row.get("psi")) else None,
-            distance_km=float(row["distance"]) if pd.notna(row.get("distance")) else None
-        )
+
+    for idx, date_str, project_str, truck_str, load_m3, mix_str, distance_km in zip(
+        df.index.tolist(), dates, projects, trucks, loads, psis, distances
+    ):
+        if load_m3 is None:
+            preview = {"status": "ERROR", "error": "載量格式錯誤"}
+        else:
+            preview = calc.preview_dispatch(
+                date_str=date_str,
+                project_str=project_str,
+                truck_str=truck_str,
+                load_m3=load_m3,
+                mix_str=mix_str,
+                distance_km=distance_km
+            )
         preview["row_index"] = idx
         results.append(preview)
-    
-    return {"previews": results, "total": len(df)}
+
+    return results
 
 
 # ============================================================
 # HTML 頁面
 # ============================================================
 
-def get_main_page_html():
-    return """
-<!DOCTYPE html>
-<html lang="zh-TW">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>預拌混凝土出車管理系統 v2</title>
-    <style>
-        * { box-sizing: border-box; margin: 0; padding: 0; }
-        body { 
-            font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, sans-serif;
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            min-height: 100vh;
-            padding: 20px;
-        }
-        .container { max-width: 1400px; margin: 0 auto; }
-        h1 { color: white; text-align: center; margin-bottom: 30px; text-shadow: 2px 2px 4px rgba(0,0,0,0.2); }
-        
-        .card {
-            background: white;
-            border-radius: 12px;
-            padding: 24px;
-            margin-bottom: 20px;
-            box-shadow: 0 10px 40px rgba(0,0,0,0.2);
-        }
-        .card h2 { color: #333; margin-bottom: 20px; border-bottom: 2px solid #667eea; padding-bottom: 10px; }
-        
-        .grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(300px, 1fr)); gap: 20px; }
-        
-        .form-row { display: flex; gap: 15px; margin-bottom: 15px; flex-wrap: wrap; }
-        .form-group { flex: 1; min-width: 150px; }
-        .form-group.wide { min-width: 300px; }
-        label { display: block; margin-bottom: 5px; font-weight: 600; color: #555; }
-        input, select { 
-            width: 100%; padding: 12px; border: 2px solid #e0e0e0; border-radius: 8px;
-            font-size: 14px; transition: border-color 0.3s;
-        }
-        input:focus, select:focus { outline: none; border-color: #667eea; }
-        
-        .btn {
-            padding: 12px 24px; border: none; border-radius: 8px; cursor: pointer;
-            font-size: 14px; font-weight: 600; transition: transform 0.2s, box-shadow 0.2s;
-        }
-        .btn:hover { transform: translateY(-2px); box-shadow: 0 4px 12px rgba(0,0,0,0.2); }
-        .btn-primary { background: linear-gradient(135deg, #667eea, #764ba2); color: white; }
-        .btn-success { background: linear-gradient(135deg, #11998e, #38ef7d); color: white; }
-        .btn-danger { background: #ff6b6b; color: white; }
-        .btn-secondary { background: #e5e7eb; color: #374151; }
-        .btn-secondary:hover { background: #d1d5db; }
-        
-        table { width: 100%; border-collapse: collapse; margin-top: 15px; }
-        th, td { padding: 12px; text-align: left; border-bottom: 1px solid #eee; }
-        th { background: #f8f9fa; font-weight: 600; color: #555; }
-        tr:hover { background: #f8f9fa; }
-        
-        .dispatch-input { width: 100%; border: none; padding: 8px; background: transparent; }
-        .dispatch-input:focus { background: #fff3cd; outline: none; }
-        
-        .status-ok { color: #11998e; font-weight: 600; }
-        .status-error { color: #ff6b6b; background: #ffe6e6; }
-        
-        .stat-card {
-            background: linear-gradient(135deg, #667eea, #764ba2);
-            color: white; padding: 20px; border-radius: 12px; text-align: center;
-        }
-        .stat-card h3 { font-size: 14px; opacity: 0.8; margin-bottom: 8px; }
-        .stat-card .value { font-size: 28px; font-weight: 700; }
-        
-        .tabs { display: flex; gap: 5px; margin-bottom: 20px; }
-        .tab {
-            padding: 12px 24px; background: rgba(255,255,255,0.2); color: white;
-            border: none; border-radius: 8px 8px 0 0; cursor: pointer; font-weight: 600;
-        }
-        .tab.active { background: white; color: #667eea; }
-        
-        #result-area { display: none; }
-        .profit-positive { color: #11998e; }
-        .profit-negative { color: #ff6b6b; }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🚛 預拌混凝土出車管理系統 v2</h1>
-        <p style="text-align: center; margin-bottom: 20px;">
-            <a href="/admin" style="color: white; text-decoration: none; background: rgba(255,255,255,0.2); padding: 8px 16px; border-radius: 20px;">⚙️ 基礎資料管理</a>
-            <a href="/docs" target="_blank" style="color: white; text-decoration: none; background: rgba(255,255,255,0.2); padding: 8px 16px; border-radius: 20px; margin-left: 10px;">📖 API 文件</a>
-        </p>
-
-        <div style="display:flex; gap:10px; align-items:flex-end; justify-content:flex-end; margin-bottom:10px;">
-            <div class="form-group" style="max-width:180px;">
-                <label style="color:white; opacity:0.9;">統計起始日</label>
-                <input type="date" id="stat-start" style="background:rgba(255,255,255,0.9);">
-            </div>
-            <div class="form-group" style="max-width:180px;">
-                <label style="color:white; opacity:0.9;">統計結束日</label>
-                <input type="date" id="stat-end" style="background:rgba(255,255,255,0.9);">
-            </div>
-            <button class="btn btn-secondary" onclick="loadStats()">更新統計</button>
-        </div>
-
-        <div class="grid" id="stats-grid" style="margin-bottom: 20px;">
-            <div class="stat-card">
-                <h3>出車趟次</h3>
-                <div class="value" id="stat-trips">-</div>
-            </div>
-            <div class="stat-card">
-                <h3>出貨方數</h3>
-                <div class="value" id="stat-m3">-</div>
-            </div>
-            <div class="stat-card">
-                <h3>收入</h3>
-                <div class="value" id="stat-revenue">-</div>
-            </div>
-            <div class="stat-card">
-                <h3>成本</h3>
-                <div class="value" id="stat-cost">-</div>
-            </div>
-            <div class="stat-card">
-                <h3>毛利</h3>
-                <div class="value" id="stat-profit">-</div>
-            </div>
-        </div>
-        
-        <div class="tabs">
-            <button class="tab active" onclick="showTab(event, 'dispatch')">📥 快速出車</button>
-            <button class="tab" onclick="showTab(event, 'records')">📋 出車紀錄</button>
-            <button class="tab" onclick="showTab(event, 'master')">⚙️ 基礎資料</button>
-        </div>
-        
-        <div id="tab-dispatch" class="card">
-            <h2>📥 快速出車登錄</h2>
-            <p style="color:#666; margin-bottom:20px;">只輸入總出貨量與車次，不需逐車登錄司機資訊。</p>
-
-            <div class="form-row">
-                <div class="form-group">
-                    <label>📅 日期</label>
-                    <input type="date" id="summary-date">
-                </div>
-                <div class="form-group wide">
-                    <label>🏗️ 工程</label>
-                    <select id="summary-project"><option>載入中...</option></select>
-                </div>
-                <div class="form-group">
-                    <label>配比</label>
-                    <select id="summary-mix"><option>載入中...</option></select>
-                </div>
-                <div class="form-group">
-                    <label>總出貨量 (m³)</label>
-                    <input type="number" id="summary-total-m3" step="0.5" value="0" oninput="renderTripSummary()">
-                </div>
-            </div>
-
-            <div class="card" style="background:#f8f9ff; border:1px solid #e5e7eb;">
-                <div class="form-row" style="align-items:center;">
-                    <div class="form-group">
-                        <label>車次數量</label>
-                        <div style="display:flex; gap:8px; align-items:center;">
-                            <button class="btn btn-secondary" onclick="updateTripCount(-5)">-5</button>
-                            <button class="btn btn-secondary" onclick="updateTripCount(-1)">-1</button>
-                            <span id="trip-count" style="font-size:22px; font-weight:700; color:#4b5563; width:60px; text-align:center;">0</span>
-                            <button class="btn btn-secondary" onclick="updateTripCount(1)">+1</button>
-                            <button class="btn btn-secondary" onclick="updateTripCount(5)">+5</button>
-                        </div>
-                    </div>
-                    <div class="form-group" style="flex:1;">
-                        <label>今日概況</label>
-                        <div style="display:flex; gap:20px; flex-wrap:wrap; color:#4b5563;">
-                            <div>車次：<strong id="summary-trips">0</strong> 趟</div>
-                            <div>總量：<strong id="summary-total">0</strong> m³</div>
-                            <div>預估總距離：<strong id="summary-distance">0</strong> km</div>
-                        </div>
-                    </div>
-                </div>
-            </div>
-
-            <div style="margin-top:20px; display:flex; gap:10px;">
-                <button class="btn btn-success" onclick="saveDailySummary()">💾 紀錄</button>
-                <button class="btn btn-secondary" onclick="resetSummaryForm()">↺ 重填</button>
-            </div>
-        </div>
-        
-        <div id="tab-records" class="card" style="display:none;">
-            <h2>📋 出車紀錄查詢</h2>
-            <div class="form-row">
-                <div class="form-group">
-                    <label>起始日期</label>
-                    <input type="date" id="query-start">
-                </div>
-                <div class="form-group">
-                    <label>結束日期</label>
-                    <input type="date" id="query-end">
-                </div>
-                <div class="form-group">
-                    <label>工程</label>
-                    <select id="query-project"><option value="">全部</option></select>
-                </div>
-                <div class="form-group" style="display:flex; align-items:flex-end;">
-                    <button class="btn btn-primary" onclick="queryRecords()">🔍 查詢</button>
-                </div>
-            </div>
-            <div id="records-result"></div>
-            <div id="dispatch-list"></div>
-        </div>
-        
-        <div id="tab-master" class="card" style="display:none;">
-            <h2>⚙️ 基礎資料管理</h2>
-            <p>API 文件：<a href="/docs" target="_blank">/docs</a></p>
-            <div class="grid" style="margin-top:20px;">
-                <div>
-                    <h3>工程 (<span id="project-count">0</span>)</h3>
-                    <div id="project-list" style="max-height:300px; overflow:auto;"></div>
-                </div>
-                <div>
-                    <h3>車輛 (<span id="truck-count">0</span>)</h3>
-                    <div id="truck-list" style="max-height:300px; overflow:auto;"></div>
-                </div>
-                <div>
-                    <h3>配比 (<span id="mix-count">0</span>)</h3>
-                    <div id="mix-list" style="max-height:300px; overflow:auto;"></div>
-                </div>
-            </div>
-        </div>
-    </div>
-
-    <div id="edit-dispatch-modal" class="modal-overlay">
-        <div class="modal" style="max-width:600px;">
-            <div class="modal-header"><h3>編輯出車</h3><button class="modal-close" onclick="document.getElementById('edit-dispatch-modal').style.display='none'">&times;</button></div>
-            <div class="modal-body">
-                <input type="hidden" id="edit-dispatch-id">
-                <div class="form-grid">
-                    <div class="form-group"><label>日期</label><input type="date" id="edit-dispatch-date"></div>
-                    <div class="form-group"><label>工程代號</label><input type="text" id="edit-dispatch-project"></div>
-                    <div class="form-group"><label>車號/司機</label><input type="text" id="edit-dispatch-truck"></div>
-                    <div class="form-group"><label>配比(PSI 或代號)</label><input type="text" id="edit-dispatch-mix"></div>
-                    <div class="form-group"><label>載量(m³)</label><input type="number" step="0.1" id="edit-dispatch-load"></div>
-                    <div class="form-group"><label>距離(km)</label><input type="number" step="0.1" id="edit-dispatch-distance"></div>
-                </div>
-            </div>
-            <div class="modal-footer"><button class="btn btn-secondary" onclick="document.getElementById('edit-dispatch-modal').style.display='none'">取消</button><button class="btn btn-success" onclick="saveDispatchEdit()">儲存</button></div>
-        </div>
-    </div>
-
-    <script>
-        const today = new Date().toISOString().split('T')[0];
-        document.getElementById('summary-date').value = today;
-        document.getElementById('query-start').value = today;
-        document.getElementById('query-end').value = today;
-        document.getElementById('stat-start').value = today;
-        document.getElementById('stat-end').value = today;
-
-        let projects = [], trucks = [], mixes = [], tripCount = 0;
-
-        async function loadData() {
-            projects = await fetch('/api/projects').then(r => r.json());
-            trucks = await fetch('/api/trucks').then(r => r.json());
-            mixes = await fetch('/api/mixes').then(r => r.json());
-
-            const projectOptions = projects.map(p => `<option value="${p.code}">${p.name} (${p.code})</option>`).join('');
-            document.getElementById('summary-project').innerHTML = '<option value="">請選擇</option>' + projectOptions;
-            document.getElementById('query-project').innerHTML = '<option value="">全部</option>' + projectOptions;
-            const mixOptions = mixes.filter(m => m.is_active).map(m => `<option value="${m.code}">${m.code} (${m.psi} PSI)</option>`).join('');
-            document.getElementById('summary-mix').innerHTML = '<option value="">請選擇</option>' + mixOptions;
-
-            document.getElementById('project-count').textContent = projects.length;
-            document.getElementById('truck-count').textContent = trucks.length;
-            document.getElementById('mix-count').textContent = mixes.length;
-
-            document.getElementById('project-list').innerHTML = projects.map(p => 
-                `<div style="padding:8px; border-bottom:1px solid #eee;">${p.code} - ${p.name}</div>`
-            ).join('');
-            document.getElementById('truck-list').innerHTML = trucks.map(t => 
-                `<div style="padding:8px; border-bottom:1px solid #eee;">${t.code} - ${t.plate_no} (${t.driver_name || '-'})</div>`
-            ).join('');
-            document.getElementById('mix-list').innerHTML = mixes.map(m => 
-                `<div style="padding:8px; border-bottom:1px solid #eee;">${m.code} - ${m.psi}psi</div>`
-            ).join('');
-
-            renderTripSummary();
-            loadStats();
-        }
-
-        async function loadStats() {
-            const start = document.getElementById('stat-start').value || today;
-            const end = document.getElementById('stat-end').value || start;
-            const params = new URLSearchParams({ start_date: start, end_date: end });
-            try {
-                const data = await fetch(`/api/reports/daily?${params.toString()}`).then(r => r.json());
-                document.getElementById('stat-trips').textContent = data.summary.total_trips;
-                document.getElementById('stat-m3').textContent = data.summary.total_m3.toFixed(1) + ' m³';
-                document.getElementById('stat-revenue').textContent = '$' + data.summary.total_revenue.toLocaleString();
-                document.getElementById('stat-cost').textContent = '$' + data.summary.total_cost.toLocaleString();
-                document.getElementById('stat-profit').textContent = '$' + data.summary.gross_profit.toLocaleString();
-            } catch(e) {
-                console.log('No data for selected range');
-            }
-        }
-
-        function showTab(evt, name) {
-            document.querySelectorAll('.tab').forEach(t => t.classList.remove('active'));
-            evt.target.classList.add('active');
-            document.querySelectorAll('[id^="tab-"]').forEach(el => el.style.display = 'none');
-            document.getElementById('tab-' + name).style.display = 'block';
-        }
-
-        function getSelectedProject() {
-            const code = document.getElementById('summary-project').value;
-            return projects.find(p => p.code === code);
-        }
-
-        function getSelectedMix() {
-            const code = document.getElementById('summary-mix').value;
-            return mixes.find(m => m.code === code);
-        }
-
-        function renderTripSummary() {
-            const totalM3 = parseFloat(document.getElementById('summary-total-m3').value || '0');
-            const project = getSelectedProject();
-            const distance = project ? project.default_distance_km || 0 : 0;
-            document.getElementById('trip-count').textContent = tripCount;
-            document.getElementById('summary-trips').textContent = tripCount;
-            document.getElementById('summary-total').textContent = totalM3.toFixed(1);
-            document.getElementById('summary-distance').textContent = (distance * tripCount).toFixed(1);
-        }
-
-        function updateTripCount(delta) {
-            tripCount = Math.max(0, tripCount + delta);
-            renderTripSummary();
-        }
-
-        function resetSummaryForm() {
-            document.getElementById('summary-total-m3').value = 0;
-            tripCount = 0;
-            renderTripSummary();
-        }
-
-        async function saveDailySummary() {
-            const date = document.getElementById('summary-date').value;
-            const project = document.getElementById('summary-project').value;
-            const mix = getSelectedMix();
-            const total_m3 = parseFloat(document.getElementById('summary-total-m3').value || '0');
+MAIN_PAGE_TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), "templates", "main_page.html")
 
-            if (!date || !project) { alert('請選擇日期與工程'); return; }
-            if (!mix) { alert('請選擇配比'); return; }
-            if (total_m3 <= 0) { alert('請輸入總出貨量'); return; }
 
-            const res = await fetch('/api/daily-summaries', {
-                method: 'POST',
-                headers: {'Content-Type': 'application/json'},
-                body: JSON.stringify({ date, project, psi: mix ? parseInt(mix.psi) : null, total_m3, trips: tripCount })
-            });
+@functools.lru_cache(maxsize=None)
+def _main_page_template() -> string.Template:
+    """首頁模板於第一次使用時讀入並解析；以 $name 佔位"""
+    with open(MAIN_PAGE_TEMPLATE_PATH, "r", encoding="utf-8") as f:
+        return string.Template(f.read())
 
-            if (res.ok) {
-                alert('✅ 已儲存');
-                resetSummaryForm();
-                loadStats();
-                queryRecords();
-            } else {
-                const err = await res.json();
-                alert(`❌ 儲存失敗：${err.detail || res.statusText}`);
-            }
-        }
-
-        async function queryRecords() {
-            const start = document.getElementById('query-start').value;
-            const end = document.getElementById('query-end').value;
-            const project = document.getElementById('query-project').value;
-
-            let url = `/api/daily-summaries?start_date=${start}&end_date=${end}`;
-            if (project) url += `&project_code=${project}`;
-
-            const data = await fetch(url).then(r => r.json());
-            const params = new URLSearchParams({ start_date: start, end_date: end });
-            if (project) params.append('project_code', project);
-            const dispatches = await fetch(`/api/dispatches?${params.toString()}`).then(r => r.json());
-            const financials = await fetch(`/api/reports/daily?${params.toString()}`).then(r => r.json());
-
-            const totals = { trips: 0, m3: 0 };
-            data.forEach(d => {
-                totals.trips += d.trips;
-                totals.m3 += d.total_m3;
-            });
 
-            document.getElementById('records-result').innerHTML = `
-                <p style="margin:15px 0;">共 ${data.length} 筆 | 車次 ${totals.trips} 趟 | ${totals.m3.toFixed(1)} m³</p>
-                <table>
-                    <thead><tr><th>日期</th><th>工程</th><th>強度</th><th>總出貨量(m³)</th><th>車次</th></tr></thead>
-                    <tbody>
-                        ${data.map(d => `
-                            <tr>
-                                <td>${d.date}</td>
-                                <td>${d.project_name}</td>
-                                <td>${d.psi || '-'}</td>
-                                <td>${d.total_m3.toFixed(1)}</td>
-                                <td>${d.trips}</td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-                <h3 style="margin-top:20px;">💰 收入/成本/毛利</h3>
-                <table>
-                    <thead><tr><th>工程</th><th>車次</th><th>總量(m³)</th><th>收入</th><th>成本</th><th>毛利</th></tr></thead>
-                    <tbody>
-                        ${Object.entries(financials.financials.projects || {}).map(([code, p]) => `
-                            <tr>
-                                <td>${p.project_name} (${code})<div style="font-size:11px;color:#666;">${p.formulas.revenue}<br>${p.formulas.material}<br>${p.formulas.driver}<br>${p.formulas.gross_profit}</div></td>
-                                <td>${p.trips}</td>
-                                <td>${p.m3}</td>
-                                <td>$${p.revenue.toLocaleString()}</td>
-                                <td>$${p.total_cost.toLocaleString()}</td>
-                                <td>$${p.gross_profit.toLocaleString()}</td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-            `;
-
-            document.getElementById('dispatch-list').innerHTML = `
-                <h3 style="margin:20px 0 10px;">🚚 出貨明細 (可編輯/刪除)</h3>
-                <table>
-                    <thead><tr><th>日期</th><th>工程</th><th>車號</th><th>載量</th><th>單價</th><th>收入</th><th>成本</th><th>毛利</th><th>操作</th></tr></thead>
-                    <tbody>
-                        ${dispatches.map(d => `
-                            <tr>
-                                <td>${d.date}</td>
-                                <td>${d.project_name}</td>
-                                <td>${d.truck_plate}</td>
-                                <td>${d.load_m3} m³</td>
-                                <td>${d.price_per_m3 || 0}</td>
-                                <td>$${(d.total_revenue || 0).toLocaleString()}</td>
-                                <td>$${(d.total_cost || 0).toLocaleString()}</td>
-                                <td>$${(d.gross_profit || 0).toLocaleString()}</td>
-                                <td><button class="btn btn-secondary btn-sm" onclick='openDispatchEditor(${JSON.stringify(d)})'>編輯</button> <button class="btn btn-danger btn-sm" onclick="removeDispatch(${d.id})">刪除</button></td>
-                            </tr>
-                        `).join('')}
-                    </tbody>
-                </table>
-            `;
-        }
-
-        loadData();
-    </script>
-</body>
-</html>
-"""
+def get_main_page_html(day: Optional[str] = None) -> str:
+    return _main_page_template().safe_substitute(
+        title=app.title,
+        today=day or date.today().isoformat(),
+        app_css_version=_page_etag("app.css"),
+        app_js_version=_page_etag("app.js"),
+    )
 
 
 def get_admin_page_html():
-    """管理介面 HTML - 讀取 admin.html 或使用內嵌備用"""
-    import os
-    # 嘗試讀取外部檔案
-    admin_path = os.path.join(os.path.dirname(__file__), "admin.html")
-    if os.path.exists(admin_path):
-        with open(admin_path, "r", encoding="utf-8") as f:
-            return f.read()
-    
+    """管理介面 HTML - admin.html（啟動時已讀入）或內嵌備用"""
+    if _ADMIN_HTML is not None:
+        return string.Template(_ADMIN_HTML.decode("utf-8")).safe_substitute(
+            admin_css_version=_page_etag("admin.css"),
+            admin_js_version=_page_etag("admin.js"),
+        )
+
     # 備用：回傳簡易版本
     return """
 <!DOCTYPE html>
@@ -2084,22 +2665,22 @@ def get_admin_page_html():
         }
         
         async function load() {
-            const projects = await fetch('/api/projects').then(r => r.json());
+            const [projects, trucks, mixes, settings] = await Promise.all(
+                ['/api/projects', '/api/trucks', '/api/mixes', '/api/settings']
+                    .map(u => fetch(u).then(r => r.json()))
+            );
             document.getElementById('projects-table').innerHTML = projects.map(p => 
                 `<tr><td>${p.code}</td><td>${p.name}</td><td>${p.default_distance_km} km</td></tr>`
             ).join('');
             
-            const trucks = await fetch('/api/trucks').then(r => r.json());
             document.getElementById('trucks-table').innerHTML = trucks.map(t => 
                 `<tr><td>${t.code}</td><td>${t.plate_no}</td><td>${t.driver_name || '-'}</td></tr>`
             ).join('');
             
-            const mixes = await fetch('/api/mixes').then(r => r.json());
             document.getElementById('mixes-table').innerHTML = mixes.map(m => 
                 `<tr><td>${m.code}</td><td>${m.psi}</td><td>$${m.material_cost_per_m3}</td></tr>`
             ).join('');
             
-            const settings = await fetch('/api/settings').then(r => r.json());
             settings.forEach(s => {
                 const el = document.getElementById(s.key);
                 if (el) el.value = s.value;
@@ -12,6 +12,8 @@ from datetime import date, datetime
 from typing import Optional, Dict, Any, List, Tuple
 import difflib
 import re
+import time
+import threading
 
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
@@ -19,12 +21,91 @@ from sqlalchemy import and_, or_, func
 from models import Project, Mix, Truck, ProjectPrice, Dispatch, Setting, DailySummary, DriverAttendance
 
 
+class LookupCache:
+    """
+    查詢字串 → 資料 id 的 TTL 快取（跨請求共用）
+
+    只存 id 不存 ORM 物件，避免持有已脫離 session 的物件；
+    命中時以 db.get() 取回（同 session 內為 identity map 命中）。
+    """
+
+    def __init__(self, ttl: float = 60.0, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: Dict[Any, Tuple[int, float]] = {}
+
+    def get(self, key) -> Optional[int]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        obj_id, expires_at = entry
+        if expires_at < time.monotonic():
+            self._data.pop(key, None)
+            return None
+        return obj_id
+
+    def set(self, key, obj_id: int):
+        if len(self._data) >= self.maxsize:
+            self._data.clear()
+        self._data[key] = (obj_id, time.monotonic() + self.ttl)
+
+    def clear(self):
+        self._data.clear()
+
+
+# 基礎資料異動（新增/更新/刪除）時須呼叫 .clear()
+project_lookup_cache = LookupCache()
+truck_lookup_cache = LookupCache()
+mix_lookup_cache = LookupCache()
+
+
+class SettingsCache:
+    """
+    系統設定 key → value 的快取（跨請求共用）
+
+    設定表很小且很少變動，整表載入一次；更新設定後須呼叫 .clear()。
+    TTL 較短，讓多 worker 部署時其他 worker 也能很快讀到新值。
+    """
+
+    def __init__(self, ttl: float = 10.0):
+        self.ttl = ttl
+        self._values: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_all(self, db: Session) -> Dict[str, str]:
+        values = self._values
+        if values is not None and self._expires_at >= time.monotonic():
+            return values
+        with self._lock:
+            if self._values is None or self._expires_at < time.monotonic():
+                self._values = {s.key: s.value for s in db.query(Setting).all()}
+                self._expires_at = time.monotonic() + self.ttl
+            return self._values
+
+    def clear(self):
+        with self._lock:
+            self._values = None
+
+
+settings_cache = SettingsCache()
+
+
 class DispatchCalculator:
     """出車計算引擎"""
     
     def __init__(self, db: Session):
         self.db = db
         self._dispatch_no_cache: Dict[Tuple[int, date], set] = {}
+        # 以下快取僅在此計算器（單一請求）內有效，批次出車時避免每筆重查
+        self._settings_cache: Optional[Dict[str, str]] = None
+        self._active_cache: Dict[type, list] = {}
+        self._match_cache: Dict[Tuple[type, str], Any] = {}
+        self._price_cache: Dict[Tuple[int, int, date, float], float] = {}
+        self._price_rows_cache: Dict[Tuple[int, int], List[ProjectPrice]] = {}
+        self._prefetched_projects: set = set()
+        self._trip_stats_cache: Dict[date, Tuple[Optional[int], int, int]] = {}
+        self._preview_cache: Dict[tuple, Dict[str, Any]] = {}
     
     # ========================================
     # 設定值取得
@@ -32,8 +113,9 @@ class DispatchCalculator:
     
     def get_setting(self, key: str, default: str = "") -> str:
         """取得系統設定值"""
-        setting = self.db.query(Setting).filter(Setting.key == key).first()
-        return setting.value if setting else default
+        if self._settings_cache is None:
+            self._settings_cache = settings_cache.get_all(self.db)
+        return self._settings_cache.get(key, default)
     
     def get_fuel_price(self) -> float:
         """取得當前油價"""
@@ -78,9 +160,33 @@ class DispatchCalculator:
         
         return None
     
+    def _active(self, model) -> list:
+        """取得啟用中的資料（同一計算器內只查一次）"""
+        if model not in self._active_cache:
+            self._active_cache[model] = self.db.query(model).filter(model.is_active == True).all()
+        return self._active_cache[model]
+    
+    def _cached_lookup(self, model, cache: LookupCache, query: str):
+        """從跨請求快取取回先前比對到的資料，失效或已停用則回傳 None"""
+        obj_id = cache.get(("fuzzy", query))
+        if obj_id is None:
+            return None
+        obj = self.db.get(model, obj_id)
+        if obj is None or not obj.is_active:
+            return None
+        self._match_cache[(model, query)] = obj
+        return obj
+    
     def find_project(self, query: str) -> Project:
         """查找工程（支援代碼或名稱模糊比對）"""
-        projects = self.db.query(Project).filter(Project.is_active == True).all()
+        cache_key = (Project, query)
+        if cache_key in self._match_cache:
+            return self._match_cache[cache_key]
+        cached = self._cached_lookup(Project, project_lookup_cache, query)
+        if cached is not None:
+            return cached
+        
+        projects = self._active(Project)
         
         if not projects:
             raise ValueError("資料庫中沒有任何工程")
@@ -96,11 +202,20 @@ class DispatchCalculator:
         if not matched:
             raise ValueError(f"找不到工程：{query}")
         
+        self._match_cache[cache_key] = candidates[matched]
+        project_lookup_cache.set(("fuzzy", query), candidates[matched].id)
         return candidates[matched]
     
     def find_truck(self, query: str) -> Truck:
         """查找車輛（支援代碼、車牌、司機名模糊比對）"""
-        trucks = self.db.query(Truck).filter(Truck.is_active == True).all()
+        cache_key = (Truck, query)
+        if cache_key in self._match_cache:
+            return self._match_cache[cache_key]
+        cached = self._cached_lookup(Truck, truck_lookup_cache, query)
+        if cached is not None:
+            return cached
+        
+        trucks = self._active(Truck)
         
         if not trucks:
             raise ValueError("資料庫中沒有任何車輛")
@@ -117,11 +232,20 @@ class DispatchCalculator:
         if not matched:
             raise ValueError(f"找不到車輛：{query}")
         
+        self._match_cache[cache_key] = candidates[matched]
+        truck_lookup_cache.set(("fuzzy", query), candidates[matched].id)
         return candidates[matched]
     
     def find_mix(self, query: str) -> Mix:
         """查找配比（支援代碼或 PSI）"""
-        mixes = self.db.query(Mix).filter(Mix.is_active == True).all()
+        cache_key = (Mix, query)
+        if cache_key in self._match_cache:
+            return self._match_cache[cache_key]
+        cached = self._cached_lookup(Mix, mix_lookup_cache, query)
+        if cached is not None:
+            return cached
+        
+        mixes = self._active(Mix)
         
         if not mixes:
             raise ValueError("資料庫中沒有任何配比")
@@ -131,6 +255,8 @@ class DispatchCalculator:
         if psi:
             for m in mixes:
                 if m.psi == psi:
+                    self._match_cache[cache_key] = m
+                    mix_lookup_cache.set(("fuzzy", query), m.id)
                     return m
         
         # 用代碼比對
@@ -138,6 +264,8 @@ class DispatchCalculator:
         matched = self.fuzzy_match(query, list(candidates.keys()))
         
         if matched:
+            self._match_cache[cache_key] = candidates[matched]
+            mix_lookup_cache.set(("fuzzy", query), candidates[matched].id)
             return candidates[matched]
         
         raise ValueError(f"找不到配比：{query}")
@@ -226,38 +354,93 @@ class DispatchCalculator:
     # 單價查詢
     # ========================================
     
+    @staticmethod
+    def _price_priority(price: ProjectPrice):
+        """單價優先順序：載量下限大者優先、生效日晚者優先（NULL 排最後）"""
+        return (
+            price.load_min_m3 is None,
+            -(price.load_min_m3 or 0),
+            price.effective_from is None,
+            -(price.effective_from.toordinal() if price.effective_from else 0),
+        )
+
+    def prefetch_prices(self, project_ids) -> None:
+        """一次載入多個工程的所有啟用單價，之後 get_price 不再逐筆查詢"""
+        ids = [pid for pid in set(project_ids) if pid not in self._prefetched_projects]
+        if not ids:
+            return
+        rows = self.db.query(ProjectPrice).filter(
+            ProjectPrice.project_id.in_(ids),
+            ProjectPrice.is_active == True,
+        ).all()
+        grouped: Dict[Tuple[int, int], List[ProjectPrice]] = {}
+        for price in rows:
+            grouped.setdefault((price.project_id, price.mix_id), []).append(price)
+        for key, prices in grouped.items():
+            self._price_rows_cache[key] = sorted(prices, key=self._price_priority)
+        self._prefetched_projects.update(ids)
+
+    def _price_rows(self, project_id: int, mix_id: int) -> List[ProjectPrice]:
+        """取得工程×配比的啟用單價（依優先順序排序，同一計算器內只查一次）"""
+        key = (project_id, mix_id)
+        if key not in self._price_rows_cache:
+            if project_id in self._prefetched_projects:
+                return []
+            prices = self.db.query(ProjectPrice).filter(
+                ProjectPrice.project_id == project_id,
+                ProjectPrice.mix_id == mix_id,
+                ProjectPrice.is_active == True,
+            ).all()
+            self._price_rows_cache[key] = sorted(prices, key=self._price_priority)
+        return self._price_rows_cache[key]
+
     def get_price(self, project: Project, mix: Mix, dispatch_date: date, load_m3: float) -> float:
         """取得單價，若有載運區間則依載量匹配。"""
-        price = (
-            self.db.query(ProjectPrice)
-            .filter(
-                ProjectPrice.project_id == project.id,
-                ProjectPrice.mix_id == mix.id,
-                ProjectPrice.is_active == True,
-                or_(
-                    ProjectPrice.effective_from == None,
-                    ProjectPrice.effective_from <= dispatch_date
-                ),
-                or_(
-                    ProjectPrice.effective_to == None,
-                    ProjectPrice.effective_to >= dispatch_date
-                ),
-                or_(ProjectPrice.load_min_m3 == None, ProjectPrice.load_min_m3 <= load_m3),
-                or_(ProjectPrice.load_max_m3 == None, ProjectPrice.load_max_m3 >= load_m3)
-            )
-            .order_by(
-                ProjectPrice.load_min_m3.desc().nulls_last(),
-                ProjectPrice.effective_from.desc().nulls_last()
-            )
-            .first()
-        )
+        cache_key = (project.id, mix.id, dispatch_date, load_m3)
+        if cache_key in self._price_cache:
+            return self._price_cache[cache_key]
+
+        price = next((
+            p for p in self._price_rows(project.id, mix.id)
+            if (p.effective_from is None or p.effective_from <= dispatch_date)
+            and (p.effective_to is None or p.effective_to >= dispatch_date)
+            and (p.load_min_m3 is None or p.load_min_m3 <= load_m3)
+            and (p.load_max_m3 is None or p.load_max_m3 >= load_m3)
+        ), None)
 
         if not price:
             raise ValueError(
                 f"找不到單價：工程={project.code}, 配比={mix.code}, 載量={load_m3}m³"
             )
 
+        self._price_cache[cache_key] = price.price_per_m3
         return price.price_per_m3
+
+    def prefetch_for_rows(self, project_strs, truck_strs, mix_strs=()) -> None:
+        """
+        批次預覽/寫入前先比對所有不重複的工程/車輛/配比字串並載入相關單價
+
+        比對失敗的字串略過，逐筆處理時會再回報錯誤。
+        """
+        project_ids = []
+        for query in set(project_strs):
+            try:
+                project_ids.append(self.find_project(query).id)
+            except ValueError:
+                pass
+        for query in set(truck_strs):
+            try:
+                self.find_truck(query)
+            except ValueError:
+                pass
+        for query in set(mix_strs):
+            if not query:
+                continue
+            try:
+                self.find_mix(query)
+            except ValueError:
+                pass
+        self.prefetch_prices(project_ids)
     
     # ========================================
     # 成本計算
@@ -344,11 +527,7 @@ class DispatchCalculator:
 
         driver_daily_salary = float(self.get_setting("driver_daily_salary", "0") or 0)
         default_driver_count = int(float(self.get_setting("driver_count", "0") or 0))
-        attendance_count = (
-            self.db.query(DriverAttendance.driver_count)
-            .filter(DriverAttendance.date == dispatch_date)
-            .scalar()
-        )
+        attendance_count, existing_trips, summary_trips = self._get_trip_stats(dispatch_date)
         driver_count = int(attendance_count) if attendance_count is not None else default_driver_count
 
         total_salary = driver_daily_salary * driver_count
@@ -360,18 +539,6 @@ class DispatchCalculator:
                 "amount": round(default_per_trip, 2)
             }
 
-        trip_query = self.db.query(Dispatch).filter(
-            Dispatch.date == dispatch_date,
-            Dispatch.status != "cancelled"
-        )
-        existing_trips = trip_query.count()
-
-        summary_trips = (
-            self.db.query(func.coalesce(func.sum(DailySummary.trips), 0))
-            .filter(DailySummary.date == dispatch_date)
-            .scalar()
-        ) or 0
-
         total_trips = existing_trips + summary_trips
         if include_current_trip:
             total_trips += 1
@@ -395,6 +562,26 @@ class DispatchCalculator:
             "formula": f"({round(driver_daily_salary, 2)} × {driver_count} 人) ÷ {total_trips} 趟 = {per_trip_cost}",
             "amount": per_trip_cost
         }
+
+    def _get_trip_stats(self, dispatch_date: date) -> Tuple[Optional[int], int, int]:
+        """取得當日出勤人數、已登錄出車數、日彙總車次（同一計算器內每日只查一次）"""
+        if dispatch_date not in self._trip_stats_cache:
+            attendance_count = (
+                self.db.query(DriverAttendance.driver_count)
+                .filter(DriverAttendance.date == dispatch_date)
+                .scalar()
+            )
+            existing_trips = self.db.query(Dispatch).filter(
+                Dispatch.date == dispatch_date,
+                Dispatch.status != "cancelled"
+            ).count()
+            summary_trips = (
+                self.db.query(func.coalesce(func.sum(DailySummary.trips), 0))
+                .filter(DailySummary.date == dispatch_date)
+                .scalar()
+            ) or 0
+            self._trip_stats_cache[dispatch_date] = (attendance_count, existing_trips, summary_trips)
+        return self._trip_stats_cache[dispatch_date]
     
     # ========================================
     # 收入計算
@@ -468,7 +655,39 @@ class DispatchCalculator:
         auto_commit: bool = False
     ) -> Dispatch:
         """
-        建立出車紀錄
+        建立出車紀錄（加入 session；參數同 build_dispatch_row）
+        
+        Args:
+            auto_commit: 是否自動 commit
+        
+        Returns:
+            Dispatch 物件
+        """
+        dispatch = Dispatch(**self.build_dispatch_row(
+            date_str, project_str, truck_str, load_m3,
+            mix_str=mix_str, distance_km=distance_km, fuel_price=fuel_price, note=note,
+        ))
+        self.db.add(dispatch)
+        
+        if auto_commit:
+            self.db.commit()
+            self.db.refresh(dispatch)
+        
+        return dispatch
+    
+    def build_dispatch_row(
+        self,
+        date_str: str,
+        project_str: str,
+        truck_str: str,
+        load_m3: float,
+        mix_str: Optional[str] = None,
+        distance_km: Optional[float] = None,
+        fuel_price: Optional[float] = None,
+        note: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        計算一筆出車紀錄的欄位值（不加入 session，供批次 INSERT 使用）
         
         Args:
             date_str: 日期
@@ -479,10 +698,9 @@ class DispatchCalculator:
             distance_km: 距離，預設用工程的預設距離
             fuel_price: 油價，預設用系統設定
             note: 備註
-            auto_commit: 是否自動 commit
         
         Returns:
-            Dispatch 物件
+            Dispatch 欄位 dict
         """
         # 1. 解析日期
         dispatch_date = self.parse_date(date_str)
@@ -548,8 +766,8 @@ class DispatchCalculator:
         if existing:
             raise ValueError(f"疑似重複：同日同工程同車同載量已有紀錄 ({existing.dispatch_no})")
         
-        # 13. 建立紀錄
-        dispatch = Dispatch(
+        # 13. 組成欄位
+        return dict(
             dispatch_no=dispatch_no,
             date=dispatch_date,
             project_id=project.id,
@@ -570,14 +788,6 @@ class DispatchCalculator:
             fuel_price=fuel_price,
             note=note
         )
-        
-        self.db.add(dispatch)
-        
-        if auto_commit:
-            self.db.commit()
-            self.db.refresh(dispatch)
-        
-        return dispatch
     
     # ========================================
     # 預覽功能
@@ -594,10 +804,29 @@ class DispatchCalculator:
     ) -> Dict[str, Any]:
         """
         預覽出車資料（不寫入資料庫）
+
+        預覽結果只取決於輸入值（當日車次統計在計算器內固定），
+        批次中相同的列（同車同載量多趟）只計算一次，之後回傳淺拷貝。
         
         Returns:
             預覽資料字典
         """
+        key = (date_str, project_str, truck_str, load_m3, mix_str, distance_km)
+        cached = self._preview_cache.get(key)
+        if cached is None:
+            cached = self._preview_cache[key] = self._compute_preview(*key)
+        return dict(cached)
+
+    def _compute_preview(
+        self,
+        date_str: str,
+        project_str: str,
+        truck_str: str,
+        load_m3: float,
+        mix_str: Optional[str],
+        distance_km: Optional[float]
+    ) -> Dict[str, Any]:
+        """計算單筆預覽（由 preview_dispatch 快取結果）"""
         try:
             dispatch_date = self.parse_date(date_str)
             project = self.find_project(project_str)
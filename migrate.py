@@ -8,7 +8,7 @@ import sqlite3
 from datetime import datetime
 
 from models import (
-    init_db, SessionLocal, reset_db,
+    init_db, SessionLocal, reset_db, refresh_daily_project_stats,
     Project, Mix, Truck, ProjectPrice, Dispatch, Setting
 )
 
@@ -291,6 +291,9 @@ def migrate_from_old_db(old_db_path: str = "../concrete_system/concrete_profit.d
     db.commit()
     print(f"  ✓ 遷移 {dispatch_count} 筆出車紀錄")
     
+    # 報表 materialized view 需重新彙總（僅 PostgreSQL）
+    refresh_daily_project_stats(db)
+    
     # 關閉連接
     old_conn.close()
     db.close()
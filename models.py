@@ -8,6 +8,7 @@
 4. 支援軟刪除（is_active）
 """
 
+import os
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Optional, List
@@ -16,20 +17,51 @@ from enum import Enum
 from sqlalchemy import (
     create_engine, Column, Integer, String, Float, Boolean, 
     Date, DateTime, ForeignKey, Text, Index, Numeric,
-    event, UniqueConstraint
+    event, UniqueConstraint, text, select, inspect
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker, Session
-from sqlalchemy.sql import func
+from sqlalchemy.pool import NullPool
+from sqlalchemy.sql import func, table, column
 
 # ============================================================
 # Database Setup
 # ============================================================
 
 DB_PATH = "concrete_v2.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = os.environ.get("DATABASE_URL", f"sqlite:///{DB_PATH}")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 連線池設定（可用環境變數覆寫）；app 的 threadpool 預設與 pool_size + max_overflow 同大小
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "20"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "40"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+# 前面有 PgBouncer（transaction mode）等外部連線池時設為 1，應用程式端不再保留連線
+DB_EXTERNAL_POOL = os.environ.get("DB_EXTERNAL_POOL", "0") == "1"
+
+
+def _create_engine(url: str):
+    """
+    建立 engine 並明確設定 QueuePool 大小
+
+    - 連線數上限固定為 pool_size + max_overflow，不會隨併發無限增加
+    - SQLite 為本機檔案，不需 pre_ping / recycle，但需允許跨執行緒使用連線
+    - DB_EXTERNAL_POOL=1 時改用 NullPool，連線的重用交給 PgBouncer
+    """
+    if DB_EXTERNAL_POOL and not url.startswith("sqlite"):
+        return create_engine(url, poolclass=NullPool)
+    pool_kwargs = dict(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    if url.startswith("sqlite"):
+        return create_engine(url, connect_args={"check_same_thread": False}, **pool_kwargs)
+    return create_engine(url, pool_pre_ping=True, pool_recycle=DB_POOL_RECYCLE, **pool_kwargs)
+
+
+engine = _create_engine(DATABASE_URL)
+# commit 後不讓物件過期，回傳剛寫入的資料時不必再逐欄 SELECT
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 Base = declarative_base()
 
 
@@ -200,6 +232,18 @@ class Mix(Base):
         
         return sand_cost + stone_cost + cement_cost + slag_cost + flyash_cost + admixture_cost
     
+    @classmethod
+    def material_cost_expr(cls, mp: "MaterialPrice"):
+        """calc_material_cost 的 SQL 版本，供整批 UPDATE 使用（單價以參數帶入）"""
+        return (
+            (cls.sand1_kg + cls.sand2_kg) * mp.sand_price
+            + (cls.stone1_kg + cls.stone2_kg) * mp.stone_price
+            + cls.cement_kg * mp.cement_price
+            + cls.slag_kg * mp.slag_price
+            + cls.flyash_kg * mp.flyash_price
+            + cls.admixture_kg * mp.admixture_price
+        )
+    
     def get_material_breakdown(self, mp: "MaterialPrice" = None) -> dict:
         """取得材料成本明細"""
         if mp is None:
@@ -249,8 +293,9 @@ class ProjectPrice(Base):
     note = Column(Text)
     
     # 關聯
-    project = relationship("Project", back_populates="prices")
-    mix = relationship("Mix", back_populates="prices")
+    # 列表一律以 selectinload/joinedload 預先載入；漏掉時直接報錯而非逐筆查詢（N+1）
+    project = relationship("Project", back_populates="prices", lazy="raise_on_sql")
+    mix = relationship("Mix", back_populates="prices", lazy="raise_on_sql")
     
     # 唯一約束：同一工程+配比+生效期間只能有一筆
     __table_args__ = (
@@ -259,6 +304,14 @@ class ProjectPrice(Base):
             name='uq_project_mix_date_load'
         ),
         Index('ix_project_price_lookup', 'project_id', 'mix_id', 'is_active'),
+        # 出車計價：只查啟用中的單價（部分索引，停用的歷史單價不佔索引空間）
+        Index(
+            'ix_projectprice_active_project_mix',
+            project_id,
+            mix_id,
+            postgresql_where=(is_active == True),
+            sqlite_where=(is_active == True),
+        ),
     )
     
     def __repr__(self):
@@ -382,15 +435,32 @@ class Dispatch(Base):
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
-    # 關聯
-    project = relationship("Project", back_populates="dispatches")
-    mix = relationship("Mix", back_populates="dispatches")
-    truck = relationship("Truck", back_populates="dispatches")
+    # 關聯：需要時以 joinedload/selectinload 明確載入，避免逐筆延遲查詢（N+1）
+    project = relationship("Project", back_populates="dispatches", lazy="raise_on_sql")
+    mix = relationship("Mix", back_populates="dispatches", lazy="raise_on_sql")
+    truck = relationship("Truck", back_populates="dispatches", lazy="raise_on_sql")
     
     # 索引
     __table_args__ = (
         Index('ix_dispatch_date_project', 'date', 'project_id'),
         Index('ix_dispatch_date_truck', 'date', 'truck_id'),
+        # 出車列表：ORDER BY date DESC, dispatch_no
+        Index('ix_dispatch_date_desc_no', date.desc(), dispatch_no),
+        # 有效出車（排除 cancelled）的日期區間查詢
+        Index(
+            'ix_dispatch_active',
+            date.desc(),
+            postgresql_where=(status != "cancelled"),
+            sqlite_where=(status != "cancelled"),
+        ),
+        # 工程報表：單一工程的有效出車依日期排序
+        Index(
+            'ix_dispatch_project_active_date',
+            project_id,
+            date,
+            postgresql_where=(status != "cancelled"),
+            sqlite_where=(status != "cancelled"),
+        ),
     )
     
     def __repr__(self):
@@ -440,6 +510,61 @@ class DriverAttendance(Base):
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
 
 
+# ============================================================
+# 報表彙總 View
+# ============================================================
+
+DAILY_PROJECT_STATS_VIEW = "mv_daily_project_stats"
+
+
+def daily_project_stats_select():
+    """每日 × 工程的出車彙總（materialized view 定義）"""
+    return select(
+        Dispatch.date.label("date"),
+        Dispatch.project_id.label("project_id"),
+        func.count(Dispatch.id).label("trips"),
+        func.coalesce(func.sum(Dispatch.load_m3), 0).label("m3"),
+        func.coalesce(func.sum(Dispatch.total_revenue), 0).label("revenue"),
+        func.coalesce(func.sum(Dispatch.total_cost), 0).label("cost"),
+        func.coalesce(func.sum(Dispatch.gross_profit), 0).label("profit"),
+    ).where(
+        Dispatch.status != "cancelled"
+    ).group_by(Dispatch.date, Dispatch.project_id)
+
+
+def uses_stats_view(bind) -> bool:
+    """只有 PostgreSQL 支援 materialized view"""
+    return bind.dialect.name == "postgresql"
+
+
+def daily_project_stats(bind):
+    """
+    報表查詢用的每日 × 工程彙總來源
+
+    PostgreSQL 讀預先彙總的 materialized view；
+    SQLite 沒有 materialized view，改用相同定義的子查詢即時彙總。
+    """
+    if uses_stats_view(bind):
+        return table(
+            DAILY_PROJECT_STATS_VIEW,
+            column("date", Date),
+            column("project_id", Integer),
+            column("trips", Integer),
+            column("m3", Float),
+            column("revenue", Float),
+            column("cost", Float),
+            column("profit", Float),
+        )
+    return daily_project_stats_select().subquery(DAILY_PROJECT_STATS_VIEW)
+
+
+def refresh_daily_project_stats(db: Session):
+    """出車資料異動後更新 materialized view"""
+    if uses_stats_view(db.get_bind()):
+        db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {DAILY_PROJECT_STATS_VIEW}"))
+        db.commit()
+
+
 # ============================================================
 # Database Initialization
 # ============================================================
@@ -448,19 +573,44 @@ def init_db():
     """建立所有資料表"""
     Base.metadata.create_all(bind=engine)
     _ensure_project_price_load_columns()
+    _ensure_indexes()
+    _ensure_report_views()
 
 
 def _ensure_project_price_load_columns():
     """確保 project_prices 表含有載量區間欄位（向後相容）。"""
-    with engine.connect() as conn:
-        existing_cols = {row[1] for row in conn.execute("PRAGMA table_info(project_prices)")}
+    with engine.begin() as conn:
+        existing_cols = {col["name"] for col in inspect(conn).get_columns("project_prices")}
         alters = []
         if "load_min_m3" not in existing_cols:
             alters.append("ALTER TABLE project_prices ADD COLUMN load_min_m3 REAL")
         if "load_max_m3" not in existing_cols:
             alters.append("ALTER TABLE project_prices ADD COLUMN load_max_m3 REAL")
         for stmt in alters:
-            conn.execute(stmt)
+            conn.execute(text(stmt))
+
+
+def _ensure_indexes():
+    """確保既有資料表也建立新增的索引（create_all 不會替已存在的表補索引）。"""
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+
+def _ensure_report_views():
+    """建立報表用 materialized view 與 CONCURRENTLY 更新所需的唯一索引（僅 PostgreSQL）。"""
+    if not uses_stats_view(engine):
+        return
+    view_sql = daily_project_stats_select().compile(engine, compile_kwargs={"literal_binds": True})
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            f"CREATE MATERIALIZED VIEW IF NOT EXISTS {DAILY_PROJECT_STATS_VIEW} AS {view_sql}"
+        )
+        conn.exec_driver_sql(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{DAILY_PROJECT_STATS_VIEW} "
+            f"ON {DAILY_PROJECT_STATS_VIEW} (date, project_id)"
+        )
 
 
 def get_db():
@@ -474,8 +624,12 @@ def get_db():
 
 def reset_db():
     """重置資料庫（刪除所有資料表後重建）"""
+    if uses_stats_view(engine):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(f"DROP MATERIALIZED VIEW IF EXISTS {DAILY_PROJECT_STATS_VIEW}")
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
+    _ensure_report_views()
 
 
 # ============================================================
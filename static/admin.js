@@ -0,0 +1,281 @@
+const API = '';
+let projectsData=[], trucksData=[], mixesData=[], pricesData=[], materialsData=[];
+
+// 側欄項目與頁面區塊固定不變，只查一次；切換時直接走訪，不再每次以選擇器搜尋整份文件
+const sidebarItems = document.querySelectorAll('.sidebar-item');
+const pages = document.querySelectorAll('.page');
+
+sidebarItems.forEach(item => {
+    item.addEventListener('click', () => {
+        setActivePage(item.dataset.page);
+    });
+});
+
+function setActivePage(page){
+    sidebarItems.forEach(i => i.classList.toggle('active', i.dataset.page === page));
+    const id = 'page-' + page;
+    pages.forEach(p => p.classList.toggle('active', p.id === id));
+}
+
+function showToast(msg, type='success') {
+    const t = document.createElement('div');
+    t.className = `toast toast-${type}`;
+    t.textContent = msg;
+    document.body.appendChild(t);
+    setTimeout(() => t.remove(), 3000);
+}
+
+function closeModal(id) { document.getElementById(id).classList.remove('show'); }
+
+// 工程
+async function loadProjects() {
+    const res = await fetch(`${API}/api/projects?active_only=false`);
+    projectsData = await res.json();
+    renderProjects(projectsData);
+    document.getElementById('price-project-filter').innerHTML = '<option value="">-- 全部 --</option>' + projectsData.filter(p=>p.is_active).map(p=>`<option value="${p.id}">${p.code} - ${p.name}</option>`).join('');
+    document.getElementById('price-project').innerHTML = projectsData.filter(p=>p.is_active).map(p=>`<option value="${p.id}">${p.code} - ${p.name}</option>`).join('');
+}
+function renderProjects(data) {
+    document.getElementById('projects-table').innerHTML = data.map(p=>`<tr><td><strong>${p.code}</strong></td><td>${p.name}</td><td class="num">${p.default_distance_km} km</td><td class="num">${p.subsidy_threshold_m3} m³</td><td class="num">$${p.subsidy_amount}</td><td><span class="badge ${p.is_active?'badge-success':'badge-danger'}">${p.is_active?'啟用':'停用'}</span></td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editProject(${p.id})">編輯</button><button class="btn btn-sm btn-primary" onclick="manageProjectPrice(${p.id})">單價</button><button class="btn btn-sm ${p.is_active?'btn-danger':'btn-success'}" onclick="toggleProject(${p.id},${!p.is_active})">${p.is_active?'停用':'啟用'}</button><button class="btn btn-sm btn-danger" onclick="deleteProject(${p.id})">刪除</button></td></tr>`).join('');
+}
+function filterProjects() { const k=document.getElementById('project-search').value.toLowerCase(); renderProjects(projectsData.filter(p=>p.code.toLowerCase().includes(k)||p.name.toLowerCase().includes(k))); }
+function openProjectModal(p=null) {
+    document.getElementById('project-modal-title').textContent = p?'編輯工程':'新增工程';
+    document.getElementById('project-id').value = p?.id||'';
+    document.getElementById('project-code').value = p?.code||'';
+    document.getElementById('project-code').disabled = !!p;
+    document.getElementById('project-name').value = p?.name||'';
+    document.getElementById('project-address').value = p?.address||'';
+    document.getElementById('project-contact-name').value = p?.contact_name||'';
+    document.getElementById('project-contact-phone').value = p?.contact_phone||'';
+    document.getElementById('project-distance').value = p?.default_distance_km||10;
+    document.getElementById('project-subsidy-threshold').value = p?.subsidy_threshold_m3||6;
+    document.getElementById('project-subsidy-amount').value = p?.subsidy_amount||500;
+    document.getElementById('project-modal').classList.add('show');
+}
+async function editProject(id) { const res=await fetch(`${API}/api/projects/${id}`); openProjectModal(await res.json()); }
+async function deleteProject(id) {
+    if(!confirm('確認刪除此工程？')) return;
+    const res=await fetch(`${API}/api/projects/${id}`,{method:'DELETE'});
+    if(res.ok){const r=await res.json();showToast(r.message||'已刪除');loadProjects();}else{showToast('刪除失敗','error');}
+}
+async function saveProject() {
+    const id=document.getElementById('project-id').value;
+    const data={code:document.getElementById('project-code').value,name:document.getElementById('project-name').value,address:document.getElementById('project-address').value,contact_name:document.getElementById('project-contact-name').value,contact_phone:document.getElementById('project-contact-phone').value,default_distance_km:parseFloat(document.getElementById('project-distance').value),subsidy_threshold_m3:parseFloat(document.getElementById('project-subsidy-threshold').value),subsidy_amount:parseFloat(document.getElementById('project-subsidy-amount').value)};
+    const res=await fetch(id?`${API}/api/projects/${id}`:`${API}/api/projects`,{method:id?'PUT':'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(data)});
+    if(res.ok){showToast(id?'已更新':'已新增');closeModal('project-modal');loadProjects();}else{showToast((await res.json()).detail||'失敗','error');}
+}
+async function toggleProject(id,active) { const p=projectsData.find(x=>x.id===id); await fetch(`${API}/api/projects/${id}`,{method:'PUT',headers:{'Content-Type':'application/json'},body:JSON.stringify({...p,is_active:active})}); showToast(active?'已啟用':'已停用'); loadProjects(); }
+
+// 車輛
+async function loadTrucks() { const res=await fetch(`${API}/api/trucks?active_only=false`); trucksData=await res.json(); renderTrucks(trucksData); }
+function renderTrucks(data) { document.getElementById('trucks-table').innerHTML = data.map(t=>`<tr><td><strong>${t.code}</strong></td><td>${t.plate_no}</td><td>${t.driver_name||'-'}</td><td>${t.driver_phone||'-'}</td><td class="num">${t.default_load_m3} m³</td><td class="num">${t.fuel_l_per_km}</td><td class="num">$${t.driver_pay_per_trip}</td><td><span class="badge ${t.is_active?'badge-success':'badge-danger'}">${t.is_active?'啟用':'停用'}</span></td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editTruck(${t.id})">編輯</button><button class="btn btn-sm btn-danger" onclick="deleteTruck(${t.id})">刪除</button></td></tr>`).join(''); }
+function filterTrucks() { const k=document.getElementById('truck-search').value.toLowerCase(); renderTrucks(trucksData.filter(t=>t.plate_no.toLowerCase().includes(k)||(t.driver_name&&t.driver_name.toLowerCase().includes(k)))); }
+function openTruckModal(t=null) {
+    document.getElementById('truck-modal-title').textContent = t?'編輯車輛':'新增車輛';
+    document.getElementById('truck-id').value = t?.id||'';
+    document.getElementById('truck-code').value = t?.code||'';
+    document.getElementById('truck-code').disabled = !!t;
+    document.getElementById('truck-plate').value = t?.plate_no||'';
+    document.getElementById('truck-driver-name').value = t?.driver_name||'';
+    document.getElementById('truck-driver-phone').value = t?.driver_phone||'';
+    document.getElementById('truck-load').value = t?.default_load_m3||8;
+    document.getElementById('truck-fuel').value = t?.fuel_l_per_km||0.5;
+    document.getElementById('truck-pay').value = t?.driver_pay_per_trip||800;
+    document.getElementById('truck-modal').classList.add('show');
+}
+async function editTruck(id) { const res=await fetch(`${API}/api/trucks/${id}`); openTruckModal(await res.json()); }
+async function saveTruck() {
+    const id=document.getElementById('truck-id').value;
+    const data={code:document.getElementById('truck-code').value,plate_no:document.getElementById('truck-plate').value,driver_name:document.getElementById('truck-driver-name').value,driver_phone:document.getElementById('truck-driver-phone').value,default_load_m3:parseFloat(document.getElementById('truck-load').value),fuel_l_per_km:parseFloat(document.getElementById('truck-fuel').value),driver_pay_per_trip:parseFloat(document.getElementById('truck-pay').value)};
+    const res=await fetch(id?`${API}/api/trucks/${id}`:`${API}/api/trucks`,{method:id?'PUT':'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(data)});
+    if(res.ok){showToast(id?'已更新':'已新增');closeModal('truck-modal');loadTrucks();}else{showToast((await res.json()).detail||'失敗','error');}
+}
+async function deleteTruck(id) {
+    if(!confirm('確認刪除此車輛？')) return;
+    const res=await fetch(`${API}/api/trucks/${id}`,{method:'DELETE'});
+    if(res.ok){const r=await res.json();showToast(r.message||'已刪除');loadTrucks();}else{showToast('刪除失敗','error');}
+}
+
+// 材料單價
+async function loadMaterials() {
+    const res=await fetch(`${API}/api/material-prices?active_only=false`);
+    materialsData=await res.json();
+    renderMaterials(materialsData);
+    document.getElementById('mix-material-price').innerHTML = '<option value="">-- 不使用 --</option>' + materialsData.filter(m=>m.is_active).map(m=>`<option value="${m.id}">${m.price_id} - ${m.name||''}</option>`).join('');
+}
+function renderMaterials(data) { document.getElementById('materials-table').innerHTML = data.map(m=>`<tr><td><strong>${m.price_id}</strong></td><td>${m.name||'-'}</td><td class="num">${m.sand_price.toFixed(4)}</td><td class="num">${m.stone_price.toFixed(4)}</td><td class="num">${m.cement_price.toFixed(4)}</td><td class="num">${m.slag_price.toFixed(4)}</td><td class="num">${m.flyash_price.toFixed(4)}</td><td class="num">${m.admixture_price.toFixed(4)}</td><td><span class="badge ${m.is_active?'badge-success':'badge-danger'}">${m.is_active?'啟用':'停用'}</span></td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editMaterial(${m.id})">編輯</button><button class="btn btn-sm btn-warning" onclick="recalcMixes(${m.id})">重算</button><button class="btn btn-sm btn-danger" onclick="deleteMaterial(${m.id})">刪除</button></td></tr>`).join(''); }
+function openMaterialModal(m=null) {
+    document.getElementById('material-modal-title').textContent = m?'編輯材料單價':'新增材料單價';
+    document.getElementById('material-id').value = m?.id||'';
+    document.getElementById('material-price-id').value = m?.price_id||'';
+    document.getElementById('material-price-id').disabled = !!m;
+    document.getElementById('material-name').value = m?.name||'';
+    document.getElementById('material-sand').value = m?.sand_price||0;
+    document.getElementById('material-stone').value = m?.stone_price||0;
+    document.getElementById('material-cement').value = m?.cement_price||0;
+    document.getElementById('material-slag').value = m?.slag_price||0;
+    document.getElementById('material-flyash').value = m?.flyash_price||0;
+    document.getElementById('material-admixture').value = m?.admixture_price||0;
+    document.getElementById('material-modal').classList.add('show');
+}
+async function editMaterial(id) { const res=await fetch(`${API}/api/material-prices/${id}`); openMaterialModal(await res.json()); }
+async function saveMaterial() {
+    const id=document.getElementById('material-id').value;
+    const data={price_id:document.getElementById('material-price-id').value,name:document.getElementById('material-name').value,sand_price:parseFloat(document.getElementById('material-sand').value),stone_price:parseFloat(document.getElementById('material-stone').value),cement_price:parseFloat(document.getElementById('material-cement').value),slag_price:parseFloat(document.getElementById('material-slag').value),flyash_price:parseFloat(document.getElementById('material-flyash').value),admixture_price:parseFloat(document.getElementById('material-admixture').value)};
+    const res=await fetch(id?`${API}/api/material-prices/${id}`:`${API}/api/material-prices`,{method:id?'PUT':'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(data)});
+    if(res.ok){showToast(id?'已更新':'已新增');closeModal('material-modal');loadMaterials();}else{showToast((await res.json()).detail||'失敗','error');}
+}
+async function recalcMixes(mpId) { if(!confirm('確定要重算配比成本?'))return; const res=await fetch(`${API}/api/material-prices/${mpId}/recalc-mixes`,{method:'POST'}); const r=await res.json(); showToast(`已更新 ${r.updated} 個配比`); loadMixes(); }
+async function deleteMaterial(id) {
+    if(!confirm('確認刪除此材料單價？')) return;
+    const res=await fetch(`${API}/api/material-prices/${id}`,{method:'DELETE'});
+    if(res.ok){const r=await res.json();showToast(r.message||'已刪除');loadMaterials();}else{showToast('刪除失敗','error');}
+}
+
+// 配比
+async function loadMixes() {
+    const res=await fetch(`${API}/api/mixes?active_only=false`);
+    mixesData=await res.json();
+    renderMixes(mixesData);
+    document.getElementById('price-mix').innerHTML = mixesData.filter(m=>m.is_active).map(m=>`<option value="${m.id}">${m.psi} PSI - ${m.name||m.code}</option>`).join('');
+    const psiOptions=[...new Set(mixesData.map(m=>m.psi))].sort((a,b)=>a-b).map(p=>`<option value="${p}">${p} PSI</option>`).join('');
+    document.getElementById('mix-psi-filter').innerHTML=`<option value="">全部強度</option>${psiOptions}`;
+}
+function renderMixes(data) { document.getElementById('mixes-table').innerHTML = data.map(m=>`<tr><td><strong>${m.code}</strong></td><td>${m.psi}</td><td>${m.name||'-'}</td><td class="num">${m.sand1_kg}</td><td class="num">${m.sand2_kg}</td><td class="num">${m.stone1_kg}</td><td class="num">${m.stone2_kg}</td><td class="num">${m.cement_kg}</td><td class="num">${m.slag_kg}</td><td class="num">${m.flyash_kg}</td><td class="num">${m.admixture_kg}</td><td class="num"><strong>$${m.material_cost_per_m3.toFixed(2)}</strong></td><td><span class="badge ${m.is_active?'badge-success':'badge-danger'}">${m.is_active?'啟用':'停用'}</span></td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editMix(${m.id})">編輯</button><button class="btn btn-sm btn-danger" onclick="deleteMix(${m.id})">刪除</button></td></tr>`).join(''); }
+function filterMixes() { const psi=document.getElementById('mix-psi-filter').value; renderMixes(psi?mixesData.filter(m=>m.psi==psi):mixesData); }
+function openMixModal(m=null) {
+    document.getElementById('mix-modal-title').textContent = m?'編輯配比':'新增配比';
+    document.getElementById('mix-id').value = m?.id||'';
+    document.getElementById('mix-code').value = m?.code||'';
+    document.getElementById('mix-code').disabled = !!m;
+    document.getElementById('mix-psi').value = m?.psi||'';
+    document.getElementById('mix-name').value = m?.name||'';
+    document.getElementById('mix-material-price').value = m?.material_price_id||'';
+    document.getElementById('mix-sand1').value = m?.sand1_kg||0;
+    document.getElementById('mix-sand2').value = m?.sand2_kg||0;
+    document.getElementById('mix-stone1').value = m?.stone1_kg||0;
+    document.getElementById('mix-stone2').value = m?.stone2_kg||0;
+    document.getElementById('mix-cement').value = m?.cement_kg||0;
+    document.getElementById('mix-slag').value = m?.slag_kg||0;
+    document.getElementById('mix-flyash').value = m?.flyash_kg||0;
+    document.getElementById('mix-admixture').value = m?.admixture_kg||0;
+    document.getElementById('mix-cost-preview').style.display = 'none';
+    document.getElementById('mix-modal').classList.add('show');
+}
+async function editMix(id) { const res=await fetch(`${API}/api/mixes/${id}`); const m=await res.json(); openMixModal(m); if(m.cost_breakdown)showCostBreakdown(m.cost_breakdown,m.material_cost_per_m3); }
+function previewMixCost() {
+    const mpId=document.getElementById('mix-material-price').value;
+    if(!mpId){showToast('請選擇材料單價','error');return;}
+    const mp=materialsData.find(m=>m.id==mpId);if(!mp)return;
+    const s1=parseFloat(document.getElementById('mix-sand1').value)||0, s2=parseFloat(document.getElementById('mix-sand2').value)||0;
+    const st1=parseFloat(document.getElementById('mix-stone1').value)||0, st2=parseFloat(document.getElementById('mix-stone2').value)||0;
+    const c=parseFloat(document.getElementById('mix-cement').value)||0, sl=parseFloat(document.getElementById('mix-slag').value)||0;
+    const f=parseFloat(document.getElementById('mix-flyash').value)||0, a=parseFloat(document.getElementById('mix-admixture').value)||0;
+    const bd={'砂':{用量:s1+s2,單價:mp.sand_price,小計:(s1+s2)*mp.sand_price},'石':{用量:st1+st2,單價:mp.stone_price,小計:(st1+st2)*mp.stone_price},'水泥':{用量:c,單價:mp.cement_price,小計:c*mp.cement_price},'爐石':{用量:sl,單價:mp.slag_price,小計:sl*mp.slag_price},'飛灰':{用量:f,單價:mp.flyash_price,小計:f*mp.flyash_price},'藥劑':{用量:a,單價:mp.admixture_price,小計:a*mp.admixture_price}};
+    showCostBreakdown(bd,Object.values(bd).reduce((s,i)=>s+i['小計'],0));
+}
+function showCostBreakdown(bd,total) {
+    let h='';for(const[n,i]of Object.entries(bd))h+=`<div class="cost-row"><span>${n}: ${i['用量'].toFixed(2)} kg × $${i['單價'].toFixed(4)}</span><span>$${i['小計'].toFixed(2)}</span></div>`;
+    h+=`<div class="cost-row"><span>總成本</span><span>$${total.toFixed(2)}/m³</span></div>`;
+    document.getElementById('mix-cost-detail').innerHTML=h;
+    document.getElementById('mix-cost-preview').style.display='block';
+}
+async function saveMix() {
+    const id=document.getElementById('mix-id').value, mpId=document.getElementById('mix-material-price').value;
+    const data={code:document.getElementById('mix-code').value,psi:parseInt(document.getElementById('mix-psi').value),name:document.getElementById('mix-name').value,material_price_id:mpId?parseInt(mpId):null,sand1_kg:parseFloat(document.getElementById('mix-sand1').value)||0,sand2_kg:parseFloat(document.getElementById('mix-sand2').value)||0,stone1_kg:parseFloat(document.getElementById('mix-stone1').value)||0,stone2_kg:parseFloat(document.getElementById('mix-stone2').value)||0,cement_kg:parseFloat(document.getElementById('mix-cement').value)||0,slag_kg:parseFloat(document.getElementById('mix-slag').value)||0,flyash_kg:parseFloat(document.getElementById('mix-flyash').value)||0,admixture_kg:parseFloat(document.getElementById('mix-admixture').value)||0,material_cost_per_m3:0};
+    const res=await fetch(id?`${API}/api/mixes/${id}`:`${API}/api/mixes`,{method:id?'PUT':'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(data)});
+    if(res.ok){const r=await res.json();showToast(id?`已更新，成本: $${r.material_cost_per_m3?.toFixed(2)||'?'}/m³`:'已新增');closeModal('mix-modal');loadMixes();}else{showToast((await res.json()).detail||'失敗','error');}
+}
+async function deleteMix(id) {
+    if(!confirm('確認刪除此配比？')) return;
+    const res=await fetch(`${API}/api/mixes/${id}`,{method:'DELETE'});
+    if(res.ok){const r=await res.json();showToast(r.message||'已刪除');loadMixes();}else{showToast('刪除失敗','error');}
+}
+
+// 單價
+async function loadPrices() { const pid=document.getElementById('price-project-filter').value; const res=await fetch(`${API}/api/prices${pid?`?project_id=${pid}`:''}`); pricesData=await res.json(); renderPrices(pricesData); }
+function renderPrices(data) {
+    document.getElementById('prices-table').innerHTML = data.map(p=>{
+        const range = (p.load_min_m3||p.load_max_m3)?`${p.load_min_m3??'-'} ~ ${p.load_max_m3??'以上'}`:'不限';
+        return `<tr><td>${p.project_name||p.project_code}</td><td>${p.mix_psi} PSI</td><td>${range}</td><td class="num"><strong>$${p.price_per_m3.toFixed(2)}</strong></td><td>${p.effective_from||'-'}</td><td><span class="badge ${p.is_active?'badge-success':'badge-danger'}">${p.is_active?'啟用':'停用'}</span></td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editPrice(${p.id})">編輯</button><button class="btn btn-sm btn-danger" onclick="deletePrice(${p.id})">刪除</button></td></tr>`;
+    }).join('');
+}
+function openPriceModal(p=null) {
+    document.getElementById('price-modal-title').textContent = p?'編輯單價':'新增單價';
+    document.getElementById('price-id').value = p?.id||'';
+    document.getElementById('price-project').value = p?.project_id||document.getElementById('price-project-filter').value||projectsData[0]?.id||'';
+    document.getElementById('price-mix').value = p?.mix_id||mixesData[0]?.id||'';
+    document.getElementById('price-load-min').value = p?.load_min_m3??'';
+    document.getElementById('price-load-max').value = p?.load_max_m3??'';
+    document.getElementById('price-amount').value = p?.price_per_m3||'';
+    document.getElementById('price-effective-from').value = p?.effective_from||new Date().toISOString().split('T')[0];
+    document.getElementById('price-modal').classList.add('show');
+}
+async function editPrice(id) { openPriceModal(pricesData.find(p=>p.id===id)); }
+async function savePrice() {
+    const minVal=document.getElementById('price-load-min').value, maxVal=document.getElementById('price-load-max').value;
+    const data={
+        project_id:parseInt(document.getElementById('price-project').value),
+        mix_id:parseInt(document.getElementById('price-mix').value),
+        load_min_m3:minVal===''?null:parseFloat(minVal),
+        load_max_m3:maxVal===''?null:parseFloat(maxVal),
+        price_per_m3:parseFloat(document.getElementById('price-amount').value),
+        effective_from:document.getElementById('price-effective-from').value||null
+    };
+    const res=await fetch(`${API}/api/prices`,{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(data)});
+    if(res.ok){showToast('已儲存');closeModal('price-modal');loadPrices();}else{showToast((await res.json()).detail||'失敗','error');}
+}
+function manageProjectPrice(projectId){
+    setActivePage('prices');
+    document.getElementById('price-project-filter').value=projectId;
+    loadPrices();
+    openPriceModal({project_id:projectId});
+}
+async function deletePrice(id) {
+    if(!confirm('確認刪除此單價？')) return;
+    const res=await fetch(`${API}/api/prices/${id}`,{method:'DELETE'});
+    if(res.ok){const r=await res.json();showToast(r.message||'已刪除');loadPrices();}else{showToast('刪除失敗','error');}
+}
+
+// 設定
+async function loadSettings() { const res=await fetch(`${API}/api/settings`); (await res.json()).forEach(s=>{const el=document.getElementById(`setting-${s.key}`);if(el)el.value=s.value;}); }
+async function saveSettings() { for(const k of['fuel_price','default_psi','default_load_m3','driver_daily_salary','driver_count'])await fetch(`${API}/api/settings/${k}`,{method:'PUT',headers:{'Content-Type':'application/json'},body:JSON.stringify({value:document.getElementById(`setting-${k}`).value})}); showToast('設定已儲存'); }
+
+// 司機出勤
+let attendanceData=[];
+function resetAttendanceForm(){
+    document.getElementById('attendance-date').value=new Date().toISOString().split('T')[0];
+    document.getElementById('attendance-count').value='';
+    document.getElementById('attendance-note').value='';
+}
+async function loadAttendance(){
+    const res=await fetch(`${API}/api/driver-attendance`);
+    attendanceData=await res.json();
+    renderAttendance();
+    if(!document.getElementById('attendance-date').value)resetAttendanceForm();
+}
+function renderAttendance(){
+    const body=document.getElementById('attendance-table');
+    if(!attendanceData.length){body.innerHTML='<tr><td colspan="4" style="text-align:center;color:#777;">尚無出勤紀錄</td></tr>';return;}
+    body.innerHTML=attendanceData.map(a=>`<tr><td>${a.date}</td><td class="num">${a.driver_count}</td><td>${a.note||''}</td><td class="action-btns"><button class="btn btn-sm btn-secondary" onclick="editAttendance('${a.date}')">編輯</button><button class="btn btn-sm btn-danger" onclick="deleteAttendance('${a.date}')">刪除</button></td></tr>`).join('');
+}
+async function saveAttendance(){
+    const payload={date:document.getElementById('attendance-date').value,driver_count:parseInt(document.getElementById('attendance-count').value||'0'),note:document.getElementById('attendance-note').value||null};
+    const res=await fetch(`${API}/api/driver-attendance`,{method:'POST',headers:{'Content-Type':'application/json'},body:JSON.stringify(payload)});
+    if(res.ok){showToast('出勤人數已更新');resetAttendanceForm();await loadAttendance();}else{showToast((await res.json()).detail||'儲存失敗','error');}
+}
+function editAttendance(date){
+    const rec=attendanceData.find(a=>a.date===date);if(!rec)return;
+    document.getElementById('attendance-date').value=rec.date;
+    document.getElementById('attendance-count').value=rec.driver_count;
+    document.getElementById('attendance-note').value=rec.note||'';
+}
+async function deleteAttendance(date){
+    if(!confirm('確認刪除此日期的出勤紀錄？'))return;
+    const res=await fetch(`${API}/api/driver-attendance/${date}`,{method:'DELETE'});
+    if(res.ok){showToast('已刪除');await loadAttendance();}else{showToast((await res.json()).detail||'刪除失敗','error');}
+}
+
+// 初始化
+(async()=>{await loadMaterials();await loadProjects();await loadTrucks();await loadMixes();await loadPrices();await loadSettings();resetAttendanceForm();await loadAttendance();})();
@@ -0,0 +1,393 @@
+// 常用元素只查一次，各 render 函式直接重用
+const EL = {
+    summaryDate: document.getElementById('summary-date'),
+    summaryProject: document.getElementById('summary-project'),
+    summaryMix: document.getElementById('summary-mix'),
+    summaryTotalM3: document.getElementById('summary-total-m3'),
+    tripCount: document.getElementById('trip-count'),
+    summaryTrips: document.getElementById('summary-trips'),
+    summaryTotal: document.getElementById('summary-total'),
+    summaryDistance: document.getElementById('summary-distance'),
+    statStart: document.getElementById('stat-start'),
+    statEnd: document.getElementById('stat-end'),
+    statTrips: document.getElementById('stat-trips'),
+    statM3: document.getElementById('stat-m3'),
+    statRevenue: document.getElementById('stat-revenue'),
+    statCost: document.getElementById('stat-cost'),
+    statProfit: document.getElementById('stat-profit'),
+    queryStart: document.getElementById('query-start'),
+    queryEnd: document.getElementById('query-end'),
+    queryProject: document.getElementById('query-project'),
+    recordsResult: document.getElementById('records-result'),
+    dispatchList: document.getElementById('dispatch-list'),
+    // 分頁標籤與內容區塊固定不變，切換時直接走訪，不再每次以選擇器搜尋整份文件
+    tabs: document.querySelectorAll('.tab'),
+    tabPanes: document.querySelectorAll('[id^="tab-"]'),
+};
+
+let projects = [], trucks = [], mixes = [], tripCount = 0;
+let projectByCode = new Map(), mixByCode = new Map();
+
+// 基礎資料清單：樣式放在 .ml-row，每列以 textContent 填入，不必解析 HTML
+function renderList(elId, rows, format) {
+    const frag = document.createDocumentFragment();
+    for (const r of rows) {
+        const div = document.createElement('div');
+        div.className = 'ml-row';
+        div.textContent = format(r);
+        frag.appendChild(div);
+    }
+    document.getElementById(elId).replaceChildren(frag);
+}
+
+// 金額格式共用同一個 formatter（與 toLocaleString() 相同的預設語系與位數），
+// 不必每格各自建立 Intl.NumberFormat
+const NUMBER_FORMAT = new Intl.NumberFormat();
+function formatNumber(n) {
+    return NUMBER_FORMAT.format(n);
+}
+
+// 取回 JSON；非 2xx 時丟出錯誤，不把錯誤內容當成資料
+async function api(path, init) {
+    const res = await fetch(path, init);
+    if (!res.ok) throw new Error(`${path}: HTTP ${res.status}`);
+    return res.json();
+}
+
+// localStorage 可能被停用或已滿，讀寫失敗時當作沒有快取
+const BOOTSTRAP_STORAGE_KEY = 'bootstrap';
+function readStorage(key) {
+    try { return localStorage.getItem(key); } catch (e) { return null; }
+}
+function writeStorage(key, value) {
+    try { localStorage.setItem(key, value); } catch (e) { /* 略過 */ }
+}
+
+async function loadData() {
+    // 統計只看日期欄位，不依賴主檔資料，與 bootstrap 同時發出
+    const statsLoaded = loadStats();
+    // 再次開啟時先以上次存下的主檔資料立即繪出畫面，不等網路往返
+    let stored = readStorage(BOOTSTRAP_STORAGE_KEY);
+    if (stored) {
+        try {
+            renderMasterData(JSON.parse(stored));
+        } catch (e) {
+            // 內容毀損或為舊版格式：丟掉，改等網路回應重繪
+            try { localStorage.removeItem(BOOTSTRAP_STORAGE_KEY); } catch (e2) { /* 略過 */ }
+            stored = null;
+        }
+    }
+    // 主檔資料帶 ETag 與 Cache-Control: no-cache，瀏覽器每次以 If-None-Match 重新驗證，未變動時只收 304；
+    // 首頁 <head> 已 preload 同一網址，這裡直接取用。內容與存下的相同時不重繪
+    const res = await fetch('/api/bootstrap');
+    if (!res.ok) throw new Error(`/api/bootstrap: HTTP ${res.status}`);
+    const body = await res.text();
+    if (body !== stored) {
+        renderMasterData(JSON.parse(body));
+        writeStorage(BOOTSTRAP_STORAGE_KEY, body);
+    }
+    await statsLoaded;
+}
+
+function renderMasterData(data) {
+    // 重新驗證後重繪時保留使用者已選的項目
+    const selects = [EL.summaryProject, EL.queryProject, EL.summaryMix];
+    const selected = selects.map(el => el.value);
+    projects = data.projects;
+    trucks = data.trucks;
+    mixes = data.mixes;
+    // 工程與配比各只走訪一次：同時建立查找表與下拉選項
+    projectByCode = new Map();
+    const projectOptions = new Array(projects.length);
+    for (let i = 0; i < projects.length; i++) {
+        const p = projects[i];
+        projectByCode.set(p.code, p);
+        projectOptions[i] = `<option value="${p.code}">${p.name} (${p.code})</option>`;
+    }
+    const projectOptionsHtml = projectOptions.join('');
+    EL.summaryProject.innerHTML = '<option value="">請選擇</option>' + projectOptionsHtml;
+    EL.queryProject.innerHTML = '<option value="">全部</option>' + projectOptionsHtml;
+
+    mixByCode = new Map();
+    const mixOptions = [];
+    for (let i = 0; i < mixes.length; i++) {
+        const m = mixes[i];
+        mixByCode.set(m.code, m);
+        if (m.is_active) mixOptions.push(`<option value="${m.code}">${m.code} (${m.psi} PSI)</option>`);
+    }
+    EL.summaryMix.innerHTML = '<option value="">請選擇</option>' + mixOptions.join('');
+    selects.forEach((el, i) => { el.value = selected[i]; });
+
+    document.getElementById('project-count').textContent = projects.length;
+    document.getElementById('truck-count').textContent = trucks.length;
+    document.getElementById('mix-count').textContent = mixes.length;
+
+    renderList('project-list', projects, p => `${p.code} - ${p.name}`);
+    renderList('truck-list', trucks, t => `${t.code} - ${t.plate_no} (${t.driver_name || '-'})`);
+    renderList('mix-list', mixes, m => `${m.code} - ${m.psi}psi`);
+
+    renderTripSummary();
+}
+
+async function loadStats() {
+    const start = EL.statStart.value || EL.statStart.defaultValue;
+    const end = EL.statEnd.value || start;
+    const params = new URLSearchParams({ start_date: start, end_date: end });
+    try {
+        const data = await api(`/api/reports/daily?${params.toString()}`);
+        EL.statTrips.textContent = data.summary.total_trips;
+        EL.statM3.textContent = data.summary.total_m3.toFixed(1) + ' m³';
+        EL.statRevenue.textContent = '$' + formatNumber(data.summary.total_revenue);
+        EL.statCost.textContent = '$' + formatNumber(data.summary.total_cost);
+        EL.statProfit.textContent = '$' + formatNumber(data.summary.gross_profit);
+    } catch(e) {
+        console.log('No data for selected range');
+    }
+}
+
+function showTab(evt, name) {
+    // currentTarget 一定是綁定 onclick 的按鈕本身（target 可能是按鈕內的子節點）
+    EL.tabs.forEach(t => t.classList.toggle('active', t === evt.currentTarget));
+    const id = 'tab-' + name;
+    EL.tabPanes.forEach(el => { el.style.display = el.id === id ? 'block' : 'none'; });
+}
+
+function getSelectedProject() {
+    return projectByCode.get(EL.summaryProject.value);
+}
+
+function getSelectedMix() {
+    return mixByCode.get(EL.summaryMix.value);
+}
+
+function renderTripSummary() {
+    const totalM3 = parseFloat(EL.summaryTotalM3.value || '0');
+    const project = getSelectedProject();
+    const distance = project ? project.default_distance_km || 0 : 0;
+    EL.tripCount.textContent = tripCount;
+    EL.summaryTrips.textContent = tripCount;
+    EL.summaryTotal.textContent = totalM3.toFixed(1);
+    EL.summaryDistance.textContent = (distance * tripCount).toFixed(1);
+}
+
+// 把連續觸發的事件合併成每個畫格最多執行一次（以最後一次的參數）
+function rafThrottle(fn) {
+    let queued = false, lastArgs;
+    return (...args) => {
+        lastArgs = args;
+        if (queued) return;
+        queued = true;
+        requestAnimationFrame(() => {
+            queued = false;
+            fn(...lastArgs);
+        });
+    };
+}
+
+// 連續輸入時每個畫格只重繪一次
+const scheduleTripSummary = rafThrottle(renderTripSummary);
+
+function updateTripCount(delta) {
+    tripCount = Math.max(0, tripCount + delta);
+    renderTripSummary();
+}
+
+function resetSummaryForm() {
+    EL.summaryTotalM3.value = 0;
+    tripCount = 0;
+    renderTripSummary();
+}
+
+async function saveDailySummary() {
+    const date = EL.summaryDate.value;
+    const project = EL.summaryProject.value;
+    const mix = getSelectedMix();
+    const total_m3 = parseFloat(EL.summaryTotalM3.value || '0');
+
+    if (!date || !project) { alert('請選擇日期與工程'); return; }
+    if (!mix) { alert('請選擇配比'); return; }
+    if (total_m3 <= 0) { alert('請輸入總出貨量'); return; }
+
+    const res = await fetch('/api/daily-summaries', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({ date, project, psi: mix ? parseInt(mix.psi) : null, total_m3, trips: tripCount })
+    });
+
+    if (res.ok) {
+        alert('✅ 已儲存');
+        resetSummaryForm();
+        loadStats();
+        queryRecords();
+    } else {
+        const err = await res.json();
+        alert(`❌ 儲存失敗：${err.detail || res.statusText}`);
+    }
+}
+
+async function queryRecords() {
+    const start = EL.queryStart.value;
+    const end = EL.queryEnd.value;
+    const project = EL.queryProject.value;
+
+    let url = `/api/daily-summaries?start_date=${start}&end_date=${end}&include_totals=1`;
+    if (project) url += `&project_code=${project}`;
+
+    const params = new URLSearchParams({ start_date: start, end_date: end });
+    if (project) params.append('project_code', project);
+    // 三個查詢互不相依，同時發出
+    const [summaries, dispatches, financials] = await Promise.all([
+        api(url),
+        api(`/api/dispatches?${params.toString()}`),
+        api(`/api/reports/daily?${params.toString()}`),
+    ]);
+
+    const data = summaries.items;
+    const totals = summaries.totals;
+
+    // 筆數多時只繪出可視範圍的列，其餘等捲動時再產生
+    const virtual = data.length > VIRTUAL_ROW_THRESHOLD;
+    const frag = document.createDocumentFragment();
+    if (!virtual) {
+        for (const d of data) frag.appendChild(summaryRow(d));
+    }
+
+    renderDetached(EL.recordsResult, `
+        <p style="margin:15px 0;">共 ${totals.count} 筆 | 車次 ${totals.trips} 趟 | ${totals.m3.toFixed(1)} m³</p>
+        <div${virtual ? ' class="virtual-scroll"' : ''}>
+        <table>
+            <thead><tr><th>日期</th><th>工程</th><th>強度</th><th>總出貨量(m³)</th><th>車次</th></tr></thead>
+            <tbody id="records-body"></tbody>
+        </table>
+        </div>
+        <h3 style="margin-top:20px;">💰 收入/成本/毛利</h3>
+        <table>
+            <thead><tr><th>工程</th><th>車次</th><th>總量(m³)</th><th>收入</th><th>成本</th><th>毛利</th></tr></thead>
+            <tbody>
+                ${Object.entries(financials.financials.projects || {}).map(([code, p]) => `
+                    <tr>
+                        <td>${p.project_name} (${code})<div style="font-size:11px;color:#666;">${p.formulas.revenue}<br>${p.formulas.material}<br>${p.formulas.driver}<br>${p.formulas.gross_profit}</div></td>
+                        <td>${p.trips}</td>
+                        <td>${p.m3}</td>
+                        <td>$${formatNumber(p.revenue)}</td>
+                        <td>$${formatNumber(p.total_cost)}</td>
+                        <td>$${formatNumber(p.gross_profit)}</td>
+                    </tr>
+                `).join('')}
+            </tbody>
+        </table>
+    `, view => view.querySelector('#records-body').appendChild(frag));
+    if (virtual) {
+        mountVirtualRows(EL.recordsResult.querySelector('.virtual-scroll'),
+            document.getElementById('records-body'), data, summaryRow, 5);
+    }
+
+    // 出貨明細同樣在 DocumentFragment 內組好；按鈕只記列號，點擊由容器上的單一 listener 處理
+    shownDispatches = dispatches;
+    const dispatchFrag = document.createDocumentFragment();
+    for (let i = 0; i < dispatches.length; i++) {
+        const d = dispatches[i];
+        const tr = document.createElement('tr');
+        for (const v of [
+            d.date, d.project_name, d.truck_plate, `${d.load_m3} m³`, d.price_per_m3 || 0,
+            '$' + formatNumber(d.total_revenue || 0),
+            '$' + formatNumber(d.total_cost || 0),
+            '$' + formatNumber(d.gross_profit || 0),
+        ]) {
+            const td = document.createElement('td');
+            td.textContent = v;
+            tr.appendChild(td);
+        }
+        const actions = document.createElement('td');
+        actions.append(
+            actionButton('編輯', 'btn-secondary', 'edit', i),
+            ' ',
+            actionButton('刪除', 'btn-danger', 'remove', i),
+        );
+        tr.appendChild(actions);
+        dispatchFrag.appendChild(tr);
+    }
+    renderDetached(EL.dispatchList, `
+        <h3 style="margin:20px 0 10px;">🚚 出貨明細 (可編輯/刪除)</h3>
+        <table>
+            <thead><tr><th>日期</th><th>工程</th><th>車號</th><th>載量</th><th>單價</th><th>收入</th><th>成本</th><th>毛利</th><th>操作</th></tr></thead>
+            <tbody id="dispatch-body"></tbody>
+        </table>
+    `, view => view.querySelector('#dispatch-body').appendChild(dispatchFrag));
+}
+
+// 每日彙總列以 DOM 節點建立：不必重新解析 HTML，textContent 也避免名稱中的 < 被當成標籤
+function summaryRow(d) {
+    const tr = document.createElement('tr');
+    for (const v of [d.date, d.project_name, d.psi || '-', d.total_m3.toFixed(1), d.trips]) {
+        const td = document.createElement('td');
+        td.textContent = v;
+        tr.appendChild(td);
+    }
+    return tr;
+}
+
+// 超過此筆數時表格改為虛擬捲動：DOM 只保留可視範圍前後幾列，上下以等高的空白列撐出捲軸
+const VIRTUAL_ROW_THRESHOLD = 200;
+const VIRTUAL_ROW_HEIGHT = 40;
+const VIRTUAL_BUFFER = 10;
+
+function mountVirtualRows(scroller, tbody, items, buildRow, colSpan) {
+    const spacer = () => {
+        const tr = document.createElement('tr');
+        tr.className = 'virtual-spacer';
+        const td = document.createElement('td');
+        td.colSpan = colSpan;
+        tr.appendChild(td);
+        return tr;
+    };
+    const top = spacer(), bottom = spacer();
+    let start = -1, end = -1;
+
+    function paint() {
+        const visible = Math.ceil((scroller.clientHeight || 480) / VIRTUAL_ROW_HEIGHT);
+        const first = Math.max(0, Math.floor(scroller.scrollTop / VIRTUAL_ROW_HEIGHT) - VIRTUAL_BUFFER);
+        const last = Math.min(items.length, first + visible + 2 * VIRTUAL_BUFFER);
+        if (first === start && last === end) return;
+        start = first;
+        end = last;
+        top.style.height = first * VIRTUAL_ROW_HEIGHT + 'px';
+        bottom.style.height = (items.length - last) * VIRTUAL_ROW_HEIGHT + 'px';
+        const rows = new Array(last - first);
+        for (let i = first; i < last; i++) rows[i - first] = buildRow(items[i]);
+        tbody.replaceChildren(top, ...rows, bottom);
+    }
+
+    // 捲動時每個畫格最多重繪一次；passive 讓瀏覽器不必等 JS 即可捲動
+    scroller.addEventListener('scroll', rafThrottle(paint), { passive: true });
+    paint();
+}
+
+// 在尚未掛上頁面的節點內組好整個區塊（外框 + 資料列），最後一次換上；組裝期間頁面不需重排
+function renderDetached(target, html, fill) {
+    const view = document.createElement('div');
+    view.innerHTML = html;
+    fill(view);
+    target.replaceChildren(...view.childNodes);
+}
+
+function actionButton(label, style, action, index) {
+    const btn = document.createElement('button');
+    btn.className = `btn ${style} btn-sm`;
+    btn.textContent = label;
+    btn.dataset.action = action;
+    btn.dataset.index = index;
+    return btn;
+}
+
+// 出貨明細的編輯/刪除：#dispatch-list 在每次查詢後才重建內容，listener 掛在容器上只需一次
+let shownDispatches = [];
+EL.dispatchList.addEventListener('click', e => {
+    const btn = e.target.closest('button[data-action]');
+    if (!btn) return;
+    const d = shownDispatches[btn.dataset.index];
+    if (btn.dataset.action === 'edit') openDispatchEditor(d);
+    else removeDispatch(d.id);
+});
+
+loadData();
@@ -0,0 +1,23 @@
+"""
+測試共用設定
+
+models 在匯入時依 DATABASE_URL 建立 engine，因此須在匯入 app 前設定。
+in-memory SQLite 會改用 SingletonThreadPool，不接受 models 設定的連線池參數，
+改用暫存目錄中的 SQLite 檔，測試結束後刪除。
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+_TMP_DIR = tempfile.mkdtemp(prefix="concrete_test_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_TMP_DIR, 'test.db')}"
+os.environ["RUN_DB_INIT"] = "1"
+os.environ["ENABLE_DOCS"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_TMP_DIR, ignore_errors=True)
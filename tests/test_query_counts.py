@@ -0,0 +1,113 @@
+"""
+查詢次數回歸測試
+
+Dispatch / ProjectPrice 的 relationship 設為 lazy="raise_on_sql"，
+在這裡確認列表與更新 API 的 SQL 次數固定，不隨筆數或 limit 增加（N+1）。
+"""
+
+import contextlib
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import app as app_module
+import models
+from calculator import project_lookup_cache, truck_lookup_cache, mix_lookup_cache, settings_cache
+
+DISPATCH_DATE = "2025-01-15"
+TRIPS = 30
+# 更新出車：讀出車 + 工程/車輛/配比比對、單價、成本彙總與出車編號，與資料量無關
+UPDATE_DISPATCH_MAX_QUERIES = 9
+
+
+@contextlib.contextmanager
+def count_queries():
+    """計算區塊內送到資料庫的 SQL 次數（各快取先清空，次數不受前一個請求影響）"""
+    for cache in (app_module.report_cache, project_lookup_cache, truck_lookup_cache,
+                  mix_lookup_cache, settings_cache):
+        cache.clear()
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(models.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(models.engine, "before_cursor_execute", before_cursor_execute)
+
+
+def add_project(client, code: str) -> int:
+    r = client.post("/api/projects", json={"code": code, "name": f"案場{code}", "default_distance_km": 10})
+    assert r.status_code == 200, r.text
+    return r.json()["id"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app_module.app) as c:
+        r = c.post("/api/mixes", json={"code": "3002", "psi": 3000, "material_cost_per_m3": 1500})
+        assert r.status_code == 200, r.text
+        mix_id = r.json()["id"]
+        for code, plate in (("D01", "ABC-123"), ("D02", "XYZ-999")):
+            r = c.post("/api/trucks", json={"code": code, "plate_no": plate, "driver_name": code})
+            assert r.status_code == 200, r.text
+        for code in ("BIG01", "SML02"):
+            project_id = add_project(c, code)
+            r = c.post("/api/prices", json={"project_id": project_id, "mix_id": mix_id, "price_per_m3": 2900})
+            assert r.status_code == 200, r.text
+
+        r = c.post("/api/dispatch/commit", json={
+            "date": DISPATCH_DATE,
+            "project": "BIG01",
+            "items": [{"truck": "ABC-123" if i % 2 else "XYZ-999", "load": 8} for i in range(TRIPS)],
+        })
+        assert r.status_code == 200, r.text
+        assert r.json()["inserted"] == TRIPS
+        c.mix_id = mix_id
+        yield c
+
+
+def test_list_dispatches_query_count_independent_of_limit(client):
+    counts = {}
+    for limit in (1, 5, TRIPS):
+        with count_queries() as statements:
+            r = client.get("/api/dispatches", params={"limit": limit, "project_code": "BIG01"})
+        assert r.status_code == 200, r.text
+        assert len(r.json()) == limit
+        counts[limit] = len(statements)
+    assert len(set(counts.values())) == 1, counts
+    assert counts[TRIPS] <= 2, counts
+
+
+def test_list_prices_query_count_independent_of_rows(client):
+    with count_queries() as statements:
+        r = client.get("/api/prices")
+    assert r.status_code == 200, r.text
+    before = len(r.json()), len(statements)
+
+    for i in range(10):
+        project_id = add_project(client, f"PRC{i:02d}")
+        r = client.post("/api/prices", json={"project_id": project_id, "mix_id": client.mix_id, "price_per_m3": 3000})
+        assert r.status_code == 200, r.text
+
+    with count_queries() as statements:
+        r = client.get("/api/prices")
+    assert r.status_code == 200, r.text
+    assert len(r.json()) == before[0] + 10
+    assert len(statements) == before[1] <= 1, (before, statements)
+
+
+@pytest.mark.parametrize("payload", [
+    {"load_m3": 9},
+    {"truck": "ABC-123"},
+    {"project": "SML02", "date": "2025-01-16"},
+])
+def test_update_dispatch_query_count(client, payload):
+    dispatch_id = client.get("/api/dispatches", params={"limit": 1, "project_code": "BIG01"}).json()[0]["id"]
+    with count_queries() as statements:
+        r = client.put(f"/api/dispatches/{dispatch_id}", json=payload)
+    assert r.status_code == 200, r.text
+    assert len(statements) <= UPDATE_DISPATCH_MAX_QUERIES, statements